@@ -62,8 +62,12 @@ class Name:
 @dataclass
 class Filter:
     key: str
-    value: str
     operation: str
+    value: Optional[Any] = None
+
+    # Numeric range
+    min: Optional[float] = None
+    max: Optional[float] = None
 
 
 @dataclass
@@ -72,8 +76,14 @@ class File:
     source_file_name: str
     target_file_name: str
     aggregate_by: Optional[str | List[str]] = None
+    # Parses names with a numeric type into their type when aggregating instead of coercing them to numbers
+    aggregate_measures: Optional[bool] = False
     names: Optional[List[Name]] = field(default_factory=list)
     filters: Optional[List[Filter]] = field(default_factory=list)
+    # Columns to write a hive-partitioned parquet dataset by instead of a single parquet file
+    partition_by: Optional[str | List[str]] = None
+    # Cumulative parquet dataset the file is appended to as partition of the period of a run
+    cumulative_file_name: Optional[str] = None
 
 
 @dataclass
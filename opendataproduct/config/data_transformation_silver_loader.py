@@ -39,6 +39,8 @@ class Dataset:
     skip_cols: Optional[int] = 0
     head: Optional[int] = None
     dropna: Optional[bool] = False
+    # Reads columns as their declared types instead of inferring them, which allows head to be applied while reading
+    declare_types: Optional[bool] = False
 
 
 @dataclass
@@ -0,0 +1,92 @@
+import collections
+import os
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+import yaml
+from dacite import from_dict
+from jinja2 import Template
+from yaml import MappingNode
+from yaml.constructor import ConstructorError
+
+from opendataproduct.tracking_decorator import TrackingDecorator
+
+
+@dataclass
+class Table:
+    name: str
+    source_file_name: str
+    # Input port the source file belongs to, by default the input port of the query
+    input_port_id: Optional[str] = None
+
+
+@dataclass
+class File:
+    target_file_name: str
+    query: str
+    tables: Optional[List[Table]] = field(default_factory=list)
+
+
+@dataclass
+class InputPort:
+    id: str
+    files: Optional[List[File]] = field(default_factory=list)
+
+
+@dataclass
+class DataTransformation:
+    input_ports: Optional[List[InputPort]] = field(default_factory=list)
+
+
+class Loader(yaml.SafeLoader):
+    """
+    Customer loader that makes sure that some fields are read in a raw format
+    """
+
+    raw_fields = ["query"]
+
+    def construct_mapping(self, node, deep=False):
+        if not isinstance(node, MappingNode):
+            raise ConstructorError(
+                None,
+                None,
+                "expected a mapping node, but found %s" % node.id,
+                node.start_mark,
+            )
+        mapping = {}
+        for key_node, value_node in node.value:
+            key = self.construct_object(key_node, deep=deep)
+            if not isinstance(key, collections.abc.Hashable):
+                raise ConstructorError(
+                    "while constructing a mapping",
+                    node.start_mark,
+                    "found unhashable key",
+                    key_node.start_mark,
+                )
+
+            # Make sure that some fields are read in a raw format
+            if key in self.raw_fields:
+                value = value_node.value
+            else:
+                value = self.construct_object(value_node, deep=deep)
+
+            mapping[key] = value
+        return mapping
+
+
+@TrackingDecorator.track_time
+def load_data_transformation_sql(
+    config_path, context=None, file_name="data-transformation-03-gold-sql.yml"
+) -> DataTransformation:
+    data_transformation_path = os.path.join(config_path, file_name)
+
+    if os.path.exists(data_transformation_path):
+        with open(data_transformation_path, "r") as file:
+            if context is None:
+                data = yaml.load(file, Loader=Loader)
+            else:
+                template = Template(file.read()).render(context)
+                data = yaml.load(template, Loader=Loader)
+        return from_dict(data_class=DataTransformation, data=data)
+    else:
+        print(f"✗️ Config file {data_transformation_path} does not exist")
@@ -6,6 +6,7 @@ from nbconvert.preprocessors import ExecutePreprocessor
 
 from opendataproduct.config.data_product_manifest_loader import DataProductManifest
 from opendataproduct.tracking_decorator import TrackingDecorator
+from opendataproduct.transform.column_statistics import build_statistics_file_path
 
 
 @TrackingDecorator.track_time
@@ -41,6 +42,7 @@ def create_jupyter_notebook_for_csv(
         )
         return
 
+    statistics_file_path = build_statistics_file_path(csv_file_path_relative)
     csv_file_path_relative = csv_file_path_relative.replace(results_path, ".")
 
     # Add the cells to the notebook
@@ -49,25 +51,54 @@ def create_jupyter_notebook_for_csv(
             f"# {data_product_manifest.metadata.name} - Sample Notebook"
         ),
         nbf.v4.new_markdown_cell("## Explore data"),
-        nbf.v4.new_code_cell(f"""
+    ]
+
+    if os.path.exists(statistics_file_path):
+        statistics_file_path_relative = statistics_file_path.replace(results_path, ".")
+
+        # Read column statistics written by aggregate_data instead of scanning the whole csv file
+        nb["cells"] += [
+            nbf.v4.new_code_cell(f"""
+import json
+import pandas as pd
+
+# Read first rows of csv file
+dataframe = pd.read_csv("{csv_file_path_relative}", nrows=5)
+            """),
+            nbf.v4.new_code_cell("""
+# Display 5 first rows
+dataframe.head()
+            """),
+            nbf.v4.new_code_cell(f"""
+# Display column statistics
+with open("{statistics_file_path_relative}", encoding="utf-8") as statistics_file:
+    statistics = json.load(statistics_file)
+
+print(f"{{statistics['rows']}} rows")
+pd.DataFrame(statistics["columns"]).set_index("name")
+            """),
+        ]
+    else:
+        nb["cells"] += [
+            nbf.v4.new_code_cell(f"""
 import pandas as pd        
 
 # Read csv file
 dataframe = pd.read_csv("{csv_file_path_relative}")
             """),
-        nbf.v4.new_code_cell("""
+            nbf.v4.new_code_cell("""
 # Display 5 first rows
 dataframe.head()
             """),
-        nbf.v4.new_code_cell("""
+            nbf.v4.new_code_cell("""
 # Display dataframe info
 dataframe.info()
             """),
-        nbf.v4.new_code_cell("""
+            nbf.v4.new_code_cell("""
 # Describe dataframe
 dataframe.describe()
             """),
-    ]
+        ]
 
     not quiet and print(f"✓ Create {os.path.basename(target_file_path)}")
 
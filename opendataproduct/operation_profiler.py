@@ -0,0 +1,161 @@
+import json
+import os
+import time
+from datetime import datetime
+
+import pandas as pd
+import pyarrow as pa
+
+
+class OperationProfiler(object):
+    """
+    Records elapsed time, rows in and out and memory delta of each operation applied to a dataframe, grouped by file
+    """
+
+    def __init__(self, name, enabled=True):
+        self.name = name
+        self.enabled = enabled
+        self.started = datetime.now()
+        self.files = []
+        self.file = None
+
+    def start_file(self, file_name):
+        if not self.enabled:
+            return
+
+        self.file = {
+            "file_name": file_name,
+            "started": time.perf_counter(),
+            "operations": {},
+        }
+        self.files.append(self.file)
+
+    def finish_file(self, dataframe: pd.DataFrame = None, status="converted"):
+        if not self.enabled or self.file is None:
+            return
+
+        self.file["elapsed"] = time.perf_counter() - self.file.pop("started")
+        self.file["rows_out"] = len(dataframe) if dataframe is not None else None
+        self.file["status"] = status
+        self.file["operations"] = list(self.file["operations"].values())
+        self.file = None
+
+    def run(self, operation, function, dataframe=None, description=None):
+        """
+        Applies an operation to a dataframe and records its profile
+        :param operation: name of the operation
+        :param function: function that takes a dataframe and returns the resulting dataframe
+        :param dataframe: dataframe the operation is applied to
+        :param description: description of the operation
+        :return: resulting dataframe
+        """
+        if not self.enabled or self.file is None:
+            return function(dataframe)
+
+        memory_in = get_memory_usage(dataframe)
+
+        started = time.perf_counter()
+        result = function(dataframe)
+        elapsed = time.perf_counter() - started
+
+        rows_in = len(dataframe) if dataframe is not None else 0
+
+        # Operations writing a dataframe do not return a result, they pass all rows through
+        self.record(
+            operation,
+            description,
+            elapsed,
+            rows_in=rows_in,
+            rows_out=len(result) if result is not None else rows_in,
+            memory_delta=(
+                get_memory_usage(result) - memory_in if result is not None else 0
+            ),
+        )
+
+        return result
+
+    def iterate(self, operation, chunks, description=None):
+        """
+        Iterates over chunks and records the time spent producing each of them
+        :param operation: name of the operation
+        :param chunks: chunks
+        :param description: description of the operation
+        :return: chunks
+        """
+        iterator = iter(chunks)
+
+        while True:
+            started = time.perf_counter()
+            try:
+                chunk = next(iterator)
+            except StopIteration:
+                return
+
+            if self.enabled and self.file is not None:
+                self.record(
+                    operation,
+                    description,
+                    time.perf_counter() - started,
+                    rows_out=len(chunk),
+                    memory_delta=get_memory_usage(chunk),
+                )
+
+            yield chunk
+
+    def record(
+        self, operation, description, elapsed, rows_in=0, rows_out=0, memory_delta=0
+    ):
+        # Chunked execution applies the same operation several times
+        record = self.file["operations"].setdefault(
+            (operation, description),
+            {
+                "operation": operation,
+                "description": description,
+                "calls": 0,
+                "elapsed": 0.0,
+                "rows_in": 0,
+                "rows_out": 0,
+                "memory_delta": 0,
+            },
+        )
+        record["calls"] += 1
+        record["elapsed"] += elapsed
+        record["rows_in"] += rows_in
+        record["rows_out"] += rows_out
+        record["memory_delta"] += memory_delta
+
+    def write(self, file_path):
+        """
+        Writes the report as json file
+        :param file_path: file path
+        :return:
+        """
+        if not self.enabled:
+            return
+
+        os.makedirs(os.path.dirname(file_path) or ".", exist_ok=True)
+
+        with open(file_path, "w", encoding="utf-8") as json_file:
+            json.dump(
+                {
+                    "name": self.name,
+                    "started": self.started.isoformat(),
+                    "files": self.files,
+                },
+                json_file,
+                ensure_ascii=False,
+                indent=2,
+            )
+
+
+def get_memory_usage(dataframe) -> int:
+    if isinstance(dataframe, pd.DataFrame):
+        return int(dataframe.memory_usage(deep=True).sum())
+    if isinstance(dataframe, pd.Series):
+        return int(dataframe.memory_usage(deep=True))
+    if isinstance(dataframe, pa.Table):
+        return int(dataframe.nbytes)
+    if hasattr(dataframe, "estimated_size"):
+        # Polars dataframe
+        return int(dataframe.estimated_size())
+    return 0
@@ -0,0 +1,93 @@
+import json
+import math
+import os
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+
+def build_statistics_file_path(file_path) -> str:
+    """
+    Builds the path of the statistics file written next to a data file
+    :param file_path: file path of csv or parquet file
+    :return: file path of statistics file
+    """
+    return f"{os.path.splitext(file_path)[0]}.statistics.json"
+
+
+def build_column_statistics(table: pa.Table, dataframe: pd.DataFrame = None) -> dict:
+    """
+    Computes count, nulls, min, max and number of distinct values of each column of a table
+    :param table: table
+    :param dataframe: dataframe the table is converted from, used to report pandas dtypes
+    :return: statistics
+    """
+    return {
+        "rows": table.num_rows,
+        "columns": [
+            {
+                "name": name,
+                "dtype": (
+                    str(dataframe[name].dtype)
+                    if dataframe is not None and name in dataframe.columns
+                    else str(column.type)
+                ),
+                **build_statistics(column),
+            }
+            for name, column in zip(table.column_names, table.columns)
+        ],
+    }
+
+
+def build_statistics(column: pa.ChunkedArray) -> dict:
+    if pa.types.is_dictionary(column.type):
+        column = column.cast(column.type.value_type)
+
+    # Nested types have no order and cannot be hashed
+    try:
+        min_max = pc.min_max(column)
+        minimum, maximum = min_max["min"].as_py(), min_max["max"].as_py()
+    except (pa.ArrowNotImplementedError, pa.ArrowTypeError):
+        minimum, maximum = None, None
+    try:
+        distinct = pc.count_distinct(column, mode="only_valid").as_py()
+    except (pa.ArrowNotImplementedError, pa.ArrowTypeError):
+        distinct = None
+
+    return {
+        "count": len(column) - column.null_count,
+        "nulls": column.null_count,
+        "min": to_json_value(minimum),
+        "max": to_json_value(maximum),
+        "distinct": distinct,
+    }
+
+
+def to_json_value(value):
+    if isinstance(value, float) and not math.isfinite(value):
+        return None
+    return value
+
+
+def write_column_statistics(
+    table: pa.Table, file_path, file_name, dataframe: pd.DataFrame = None
+):
+    """
+    Writes the column statistics of a table as json file
+    :param table: table
+    :param file_path: file path of statistics file
+    :param file_name: name of the data file the statistics describe
+    :param dataframe: dataframe the table is converted from
+    :return:
+    """
+    os.makedirs(os.path.dirname(file_path), exist_ok=True)
+
+    with open(file_path, "w", encoding="utf-8") as json_file:
+        json.dump(
+            {"file_name": file_name, **build_column_statistics(table, dataframe)},
+            json_file,
+            ensure_ascii=False,
+            indent=2,
+            default=str,
+        )
@@ -0,0 +1,38 @@
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+from pyproj import Transformer
+
+
+@lru_cache(maxsize=None)
+def get_transformer(transform_source, transform_target) -> Transformer:
+    """
+    Returns a transformer for a pair of coordinate reference systems, each pair is only built once per process
+    :param transform_source: source coordinate reference system
+    :param transform_target: target coordinate reference system
+    :return: transformer
+    """
+    return Transformer.from_crs(transform_source, transform_target, always_xy=True)
+
+
+def transform_coordinates(lon_values, lat_values, transform_source, transform_target):
+    """
+    Projects whole columns of coordinates in a single call
+    :param lon_values: longitudes (or eastings) in source coordinate reference system
+    :param lat_values: latitudes (or northings) in source coordinate reference system
+    :param transform_source: source coordinate reference system
+    :param transform_target: target coordinate reference system
+    :return: tuple of longitudes and latitudes in target coordinate reference system
+    """
+    lon = pd.to_numeric(pd.Series(lon_values), errors="coerce").to_numpy(dtype=float)
+    lat = pd.to_numeric(pd.Series(lat_values), errors="coerce").to_numpy(dtype=float)
+
+    lon, lat = get_transformer(transform_source, transform_target).transform(lon, lat)
+
+    # Mark points that could not be projected as missing
+    invalid = ~(np.isfinite(lon) & np.isfinite(lat))
+    lon[invalid] = np.nan
+    lat[invalid] = np.nan
+
+    return lon, lat
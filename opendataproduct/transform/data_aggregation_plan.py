@@ -0,0 +1,866 @@
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterable, List, Optional, Set
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import is_integer_dtype, is_numeric_dtype, pandas_dtype
+
+from opendataproduct.config.data_transformation_gold_loader import File, Filter, Name
+from opendataproduct.operation_profiler import OperationProfiler
+from opendataproduct.transform.coordinate_transformer import transform_coordinates
+from opendataproduct.transform.filter_expressions import build_filter_mask
+from opendataproduct.transform.geojson_feature_cache import GeojsonFeatureCache
+from opendataproduct.transform.geojson_feature_lookup import GeojsonFeatureIndex
+from opendataproduct.transform.string_operations import (
+    concat_strings,
+    strip_strings,
+    to_string,
+)
+
+# Relative costs of operations
+COST_COLUMN = 1  # vectorized operation on a few columns
+COST_CELL = 2  # operation on every cell of the dataframe
+COST_SPATIAL = 3  # coordinate projection and spatial lookup
+COST_AGGREGATE = 3  # grouping and aggregation
+
+
+@dataclass
+class ExecutionContext:
+    geojson_template_file_path: Optional[str] = None
+    geojson_feature_cache: Optional[GeojsonFeatureCache] = None
+    geojson_feature_indices: Dict[str, GeojsonFeatureIndex] = field(
+        default_factory=dict
+    )
+    profiler: Optional[OperationProfiler] = None
+
+    def get_geojson_feature_index(self) -> GeojsonFeatureIndex:
+        if self.geojson_template_file_path not in self.geojson_feature_indices:
+            self.geojson_feature_indices[self.geojson_template_file_path] = (
+                GeojsonFeatureIndex.from_file(self.geojson_template_file_path)
+            )
+        return self.geojson_feature_indices[self.geojson_template_file_path]
+
+
+@dataclass
+class Step:
+    operation: str
+    description: str
+    cost: int
+    apply: Callable[[pd.DataFrame, ExecutionContext], pd.DataFrame] = field(repr=False)
+    # Columns read and written by the step, None if the step writes all columns
+    reads: Set[str] = field(default_factory=set)
+    writes: Optional[Set[str]] = field(default_factory=set)
+    # Whether the step maps each row to exactly one row
+    row_wise: bool = True
+    # Whether the result of a row depends on the other rows of a column, filters are never moved ahead of such steps
+    depends_on_all_rows: bool = False
+    pushed_down: bool = False
+    # Creates an aggregation that consumes chunks, only set for steps that are not row-wise
+    create_aggregation: Optional[Callable[[], "Aggregation"]] = field(
+        default=None, repr=False
+    )
+    # Filters applied by the step, only set for filter steps
+    filters: List[Filter] = field(default_factory=list)
+    # Types applied by the step, only set for type steps
+    types: Dict[str, str] = field(default_factory=dict)
+
+
+@dataclass
+class AggregationPlan:
+    target_file_name: str
+    steps: List[Step] = field(default_factory=list)
+
+    def execute(
+        self, dataframe: pd.DataFrame, context: ExecutionContext
+    ) -> pd.DataFrame:
+        for step in self.steps:
+            dataframe = apply_step(step, dataframe, context)
+        return dataframe
+
+    def execute_chunks(
+        self,
+        read_chunks: Callable[[], Iterable[pd.DataFrame]],
+        context: ExecutionContext,
+    ) -> pd.DataFrame:
+        """
+        Executes the plan on a source that is read in chunks. Row-wise steps are applied per chunk, an aggregation
+        combines partial results so that memory is bounded by the chunk size and the number of groups. The result is
+        the same as executing the plan on the whole source
+        :param read_chunks: function that reads the chunks of the source, a source without rows must yield one
+        empty chunk with its columns
+        :param context: execution context
+        :return: dataframe
+        """
+        steps = self.resolve_types(read_chunks, context)
+
+        index = next(
+            (index for index, step in enumerate(steps) if not step.row_wise),
+            None,
+        )
+
+        if index is None:
+            plan = AggregationPlan(self.target_file_name, steps)
+            return pd.concat(
+                [plan.execute(chunk, context) for chunk in read_chunks()],
+                ignore_index=True,
+            )
+
+        step = steps[index]
+        aggregation = step.create_aggregation()
+
+        def add_chunk(chunk):
+            aggregation.add(chunk)
+            return aggregation.partial
+
+        for chunk in read_chunks():
+            for row_wise_step in steps[:index]:
+                chunk = apply_step(row_wise_step, chunk, context)
+            profile(context, step.operation, add_chunk, chunk, step.description)
+
+        dataframe = profile(
+            context,
+            step.operation,
+            lambda _: aggregation.result(),
+            None,
+            f"{step.description} (combine partial results)",
+        )
+
+        for step in steps[index + 1 :]:
+            dataframe = apply_step(step, dataframe, context)
+        return dataframe
+
+    def resolve_types(
+        self,
+        read_chunks: Callable[[], Iterable[pd.DataFrame]],
+        context: ExecutionContext,
+    ) -> List[Step]:
+        """
+        Restricts the type step to the columns whose values can all be converted. Whether a type is applied depends
+        on all rows of a column, which a single chunk cannot tell, so the source is read once more beforehand
+        :param read_chunks: function that reads the chunks of the source
+        :param context: execution context
+        :return: steps
+        """
+        index = next(
+            (index for index, step in enumerate(self.steps) if step.types),
+            None,
+        )
+
+        if index is None:
+            return self.steps
+
+        types = self.steps[index].types
+        invalid_columns = set()
+
+        for chunk in read_chunks():
+            for step in self.steps[:index]:
+                chunk = apply_step(step, chunk, context)
+            invalid_columns |= find_invalid_types(chunk, types)
+
+        type_step = build_type_step(
+            {
+                column: type
+                for column, type in types.items()
+                if column not in invalid_columns
+            }
+        )
+
+        return (
+            self.steps[:index]
+            + ([type_step] if type_step is not None else [])
+            + self.steps[index + 1 :]
+        )
+
+    def explain(self) -> str:
+        """
+        Describes the steps of the plan in execution order
+        :return: description
+        """
+        lines = [f"Plan for {self.target_file_name}"]
+        for index, step in enumerate(self.steps):
+            lines.append(
+                f"  {index + 1:>2}. {step.operation:<26} cost {step.cost}  {step.description}"
+                + ("  (pushed down)" if step.pushed_down else "")
+            )
+        return "\n".join(lines)
+
+
+def apply_step(
+    step: Step, dataframe: pd.DataFrame, context: ExecutionContext
+) -> pd.DataFrame:
+    return profile(
+        context,
+        step.operation,
+        lambda dataframe: step.apply(dataframe, context),
+        dataframe,
+        step.description,
+    )
+
+
+def profile(context: ExecutionContext, operation, function, dataframe, description):
+    if context.profiler is None:
+        return function(dataframe)
+    return context.profiler.run(operation, function, dataframe, description)
+
+
+def compile_aggregation_plan(file: File, trim=True) -> AggregationPlan:
+    """
+    Compiles the names and filters of a gold file into an execution plan
+    :param file: file
+    :param trim: False if the source has already been trimmed
+    :return: aggregation plan
+    """
+    names = file.names or []
+
+    steps = [
+        build_trim_step() if trim else None,
+        build_type_step(build_types(names)),
+        build_value_step(names),
+        *build_coordinate_transformation_steps(names),
+        *build_geojson_lookup_steps(names),
+        build_concat_step(names),
+        build_split_step(names),
+        *[build_filter_step([filter]) for filter in file.filters or []],
+        build_copy_zfill_lstrip_step(names, lstrip=True),
+    ]
+
+    if file.aggregate_by is not None:
+        steps.append(
+            build_aggregation_step(
+                file.aggregate_by,
+                build_measures(names) if file.aggregate_measures else None,
+            )
+        )
+
+    steps += [
+        # Copy again so that copies take zero-filled and stripped values, also restores columns after aggregation
+        build_copy_zfill_lstrip_step(names, lstrip=False),
+        build_fraction_step(names),
+        build_mapping_step(names),
+        build_select_step(names),
+    ]
+
+    return AggregationPlan(
+        target_file_name=file.target_file_name,
+        steps=fuse_filters(
+            push_down_filters([step for step in steps if step is not None])
+        ),
+    )
+
+
+def build_source_columns(file: File) -> Set[str]:
+    """
+    Collects the columns a gold file references, other columns of its source are never selected
+    :param file: file
+    :return: column names
+    """
+    columns = {filter.key for filter in file.filters or []}
+
+    if isinstance(file.aggregate_by, list):
+        columns.update(file.aggregate_by)
+    elif file.aggregate_by is not None:
+        columns.add(file.aggregate_by)
+
+    for name in file.names or []:
+        columns.add(name.name)
+        columns.update(name.concat or [])
+        columns.update(name.transform_lon or name.transform_lat or [])
+        columns.update(name.geojson_lookup or [])
+        columns.update(
+            column
+            for column in [
+                name.split.name if name.split else None,
+                name.copy,
+                name.numerator,
+                name.denominator,
+                name.key if name.mapping else None,
+            ]
+            if column is not None
+        )
+
+    return columns
+
+
+def push_down_filters(steps: List[Step]) -> List[Step]:
+    """
+    Moves filters ahead of more expensive row-wise steps that do not write the filtered columns
+    :param steps: steps
+    :return: reordered steps
+    """
+    steps = list(steps)
+
+    for index in range(len(steps)):
+        if steps[index].operation != "filter":
+            continue
+
+        position = index
+        while position > 0 and can_precede(steps[position], steps[position - 1]):
+            steps[position - 1], steps[position] = steps[position], steps[position - 1]
+            steps[position - 1].pushed_down = True
+            position -= 1
+
+    return steps
+
+
+def fuse_filters(steps: List[Step]) -> List[Step]:
+    """
+    Fuses adjacent filters into one step that applies a combined mask
+    :param steps: steps
+    :return: steps
+    """
+    fused = []
+
+    for step in steps:
+        if step.operation == "filter" and fused and fused[-1].operation == "filter":
+            filter_step = build_filter_step(fused[-1].filters + step.filters)
+            filter_step.pushed_down = fused[-1].pushed_down or step.pushed_down
+            fused[-1] = filter_step
+        else:
+            fused.append(step)
+
+    return fused
+
+
+def can_precede(filter_step: Step, step: Step) -> bool:
+    return (
+        step.operation != "filter"
+        and step.row_wise
+        and not step.depends_on_all_rows
+        and step.writes is not None
+        and step.cost >= filter_step.cost
+        and not (filter_step.reads & step.writes)
+    )
+
+
+#
+# Steps
+#
+
+
+def build_trim_step() -> Step:
+    def apply(dataframe, context):
+        return strip_strings(dataframe)
+
+    return Step("trim", "all string columns", COST_CELL, apply, writes=None)
+
+
+def build_types(names: List[Name]) -> Dict[str, str]:
+    # Columns are read as strings, so only other types need to be applied
+    return {name.name: name.type for name in names if name.type not in [None, "str"]}
+
+
+def build_type_step(types: Dict[str, str]) -> Optional[Step]:
+    if not types:
+        return None
+
+    def apply(dataframe, context):
+        return dataframe.astype(
+            {
+                column: type
+                for column, type in types.items()
+                if column in dataframe.columns
+            },
+            errors="ignore",
+        )
+
+    return Step(
+        "type",
+        ", ".join(f"{column}: {type}" for column, type in types.items()),
+        COST_COLUMN,
+        apply,
+        writes=set(types),
+        # A type is only applied if all values of a column can be converted
+        depends_on_all_rows=True,
+        types=types,
+    )
+
+
+def find_invalid_types(dataframe: pd.DataFrame, types: Dict[str, str]) -> Set[str]:
+    """
+    Finds columns that cannot be converted into their type, which the type step leaves unchanged
+    :param dataframe: dataframe
+    :param types: types by column name
+    :return: column names
+    """
+    invalid_columns = set()
+
+    for column, type in types.items():
+        if column in dataframe.columns:
+            try:
+                dataframe[column].astype(type)
+            except (ValueError, TypeError):
+                invalid_columns.add(column)
+
+    return invalid_columns
+
+
+def build_value_step(names: List[Name]) -> Optional[Step]:
+    values = {name.name: name.value for name in names if name.value}
+
+    if not values:
+        return None
+
+    def apply(dataframe, context):
+        for column, value in values.items():
+            dataframe[column] = value
+        return dataframe
+
+    return Step("value", ", ".join(values), COST_COLUMN, apply, writes=set(values))
+
+
+def build_coordinate_transformation_steps(names: List[Name]) -> List[Step]:
+    steps = []
+
+    for (
+        source_names,
+        transform_source,
+        transform_target,
+    ), group in group_coordinate_transformations(names).items():
+
+        def apply(
+            dataframe,
+            context,
+            source_names=source_names,
+            transform_source=transform_source,
+            transform_target=transform_target,
+            group=group,
+        ):
+            lon, lat = transform_coordinates(
+                dataframe[source_names[0]],
+                dataframe[source_names[1]],
+                transform_source,
+                transform_target,
+            )
+            for name in group:
+                dataframe[name.name] = lon if name.transform_lon else lat
+            return dataframe
+
+        steps.append(
+            Step(
+                "coordinate_transformation",
+                f"{", ".join(name.name for name in group)} from {", ".join(source_names)} ({transform_source} -> {transform_target})",
+                COST_SPATIAL,
+                apply,
+                reads=set(source_names),
+                writes={name.name for name in group},
+            )
+        )
+
+    return steps
+
+
+def group_coordinate_transformations(names: List[Name]) -> dict:
+    """
+    Groups names by the coordinates they are projected from, so that each pair of source columns is projected once
+    :param names: names
+    :return: names by source names, transform source and transform target
+    """
+    groups = {}
+    for name in names:
+        source_names = name.transform_lon or name.transform_lat
+        if source_names:
+            groups.setdefault(
+                (tuple(source_names), name.transform_source, name.transform_target),
+                [],
+            ).append(name)
+    return groups
+
+
+def build_geojson_lookup_steps(names: List[Name]) -> List[Step]:
+    steps = []
+
+    for name in [name for name in names if name.geojson_lookup]:
+
+        def apply(dataframe, context, name=name):
+            dataframe[name.name] = (
+                context.get_geojson_feature_index()
+                .lookup(
+                    dataframe[name.geojson_lookup[0]],
+                    dataframe[name.geojson_lookup[1]],
+                    cache=context.geojson_feature_cache,
+                )
+                .astype(str)
+            )
+            return dataframe
+
+        steps.append(
+            Step(
+                "geojson_lookup",
+                f"{name.name} from {", ".join(name.geojson_lookup)}",
+                COST_SPATIAL,
+                apply,
+                reads=set(name.geojson_lookup),
+                writes={name.name},
+            )
+        )
+
+    return steps
+
+
+def build_concat_step(names: List[Name]) -> Optional[Step]:
+    concat_names = [name for name in names if name.concat]
+
+    if not concat_names:
+        return None
+
+    def apply(dataframe, context):
+        for name in concat_names:
+            dataframe[name.name] = concat_strings(
+                dataframe, name.concat, name.concat_delimiter
+            )
+        return dataframe
+
+    return Step(
+        "concat",
+        ", ".join(name.name for name in concat_names),
+        COST_COLUMN,
+        apply,
+        reads={column for name in concat_names for column in name.concat},
+        writes={name.name for name in concat_names},
+    )
+
+
+def build_split_step(names: List[Name]) -> Optional[Step]:
+    split_names = [name for name in names if name.split]
+
+    if not split_names:
+        return None
+
+    def apply(dataframe, context):
+        for name in split_names:
+            dataframe[name.name] = dataframe[name.split.name].str[
+                name.split.last_n : name.split.first_n
+            ]
+        return dataframe
+
+    return Step(
+        "split",
+        ", ".join(name.name for name in split_names),
+        COST_COLUMN,
+        apply,
+        reads={name.split.name for name in split_names},
+        writes={name.name for name in split_names},
+    )
+
+
+def build_filter_step(filters: List[Filter]) -> Step:
+    def apply(dataframe, context):
+        # Take rows by position so that the result is a new dataframe rather than a copy of a slice
+        return dataframe.take(np.flatnonzero(build_filter_mask(dataframe, filters)))
+
+    return Step(
+        "filter",
+        " and ".join(
+            f"{filter.key} {filter.operation} {filter.value if filter.value is not None else ""}".strip()
+            for filter in filters
+        ),
+        COST_COLUMN,
+        apply,
+        reads={filter.key for filter in filters},
+        writes=set(),
+        filters=filters,
+    )
+
+
+def build_copy_zfill_lstrip_step(names: List[Name], lstrip) -> Optional[Step]:
+    copy_names = [name for name in names if name.copy]
+    fill_names = [name for name in names if name.zfill or (lstrip and name.lstrip)]
+
+    if not copy_names and not fill_names:
+        return None
+
+    def apply(dataframe, context):
+        # Copy all columns before any of them is zero-filled or stripped
+        for name in [name for name in copy_names if name.copy in dataframe.columns]:
+            dataframe[name.name] = dataframe[name.copy]
+
+        # Apply zfill and lstrip in a single pass per column
+        for name in [name for name in fill_names if name.name in dataframe.columns]:
+            column = to_string(dataframe[name.name])
+            if name.zfill:
+                column = column.str.zfill(name.zfill)
+            if lstrip and name.lstrip:
+                column = column.str.lstrip(name.lstrip)
+            dataframe[name.name] = column
+        return dataframe
+
+    return Step(
+        "copy_zfill_lstrip" if lstrip else "copy_zfill",
+        ", ".join(dict.fromkeys(name.name for name in copy_names + fill_names)),
+        COST_COLUMN,
+        apply,
+        reads={name.copy for name in copy_names},
+        writes={name.name for name in copy_names + fill_names},
+    )
+
+
+def build_measures(names: List[Name]) -> Dict[str, str]:
+    """
+    Identifies measures, which are names with a numeric type
+    :param names: names
+    :return: types by measure name
+    """
+    return {name.name: name.type for name in names if is_numeric_type(name.type)}
+
+
+def is_numeric_type(type) -> bool:
+    try:
+        return type is not None and is_numeric_dtype(pandas_dtype(type))
+    except TypeError:
+        return False
+
+
+def build_aggregation_step(aggregate_by, measures: Dict[str, str] = None) -> Step:
+    def apply(dataframe, context):
+        aggregation = Aggregation(aggregate_by, measures)
+        aggregation.add(dataframe)
+        return aggregation.result()
+
+    return Step(
+        "aggregation",
+        f"by {aggregate_by}"
+        + (
+            f" ({", ".join(f"{name}: {type}" for name, type in measures.items())})"
+            if measures
+            else " (all numeric columns)"
+        ),
+        COST_AGGREGATE,
+        apply,
+        writes=None,
+        row_wise=False,
+        create_aggregation=lambda: Aggregation(aggregate_by, measures),
+    )
+
+
+class Aggregation(object):
+    """
+    Sums numeric columns by group, either at once or chunk by chunk keeping one partial sum per group. All columns
+    are converted to numbers and those that are not fully numeric are dropped. If measures are declared, they are
+    parsed into their types instead, while the dimensions to group by keep their values and are grouped as
+    categoricals
+    """
+
+    def __init__(self, aggregate_by, measures: Dict[str, str] = None):
+        self.aggregate_by = aggregate_by
+        self.dimensions = (
+            []
+            if aggregate_by == "total"
+            else [aggregate_by] if isinstance(aggregate_by, str) else list(aggregate_by)
+        )
+        self.measures = {
+            name: type
+            for name, type in (measures or {}).items()
+            if name not in self.dimensions
+        }
+        # Types of dimensions before they are grouped as categoricals
+        self.dimension_dtypes = {}
+        self.partial = None
+        # Columns that are not numeric in at least one chunk
+        self.invalid_columns = set()
+
+    def add(self, dataframe: pd.DataFrame):
+        if self.measures:
+            numeric = self.apply_schema(dataframe)
+        else:
+            numeric = self.to_numeric(dataframe)
+
+        partial = self.sum(self.drop_invalid_columns(numeric))
+
+        if self.partial is not None:
+            partial = self.sum(
+                pd.concat(
+                    [self.drop_invalid_columns(self.partial), partial],
+                    ignore_index=True,
+                )
+            )
+
+        self.partial = partial
+
+    def to_numeric(self, dataframe: pd.DataFrame) -> pd.DataFrame:
+        # Convert all to numeric and drop non-numeric columns
+        numeric = dataframe.apply(pd.to_numeric, errors="coerce")
+        numeric = numeric.select_dtypes(include=["number"])
+        self.invalid_columns |= set(dataframe.columns) - set(numeric.columns)
+        self.invalid_columns |= set(numeric.columns[numeric.isna().any()])
+        return numeric
+
+    def apply_schema(self, dataframe: pd.DataFrame) -> pd.DataFrame:
+        for dimension in self.dimensions:
+            self.dimension_dtypes.setdefault(dimension, dataframe[dimension].dtype)
+
+        others = [
+            column
+            for column in dataframe.columns
+            if column not in self.dimensions and column not in self.measures
+        ]
+
+        return pd.concat(
+            [
+                pd.DataFrame(
+                    {
+                        **{
+                            dimension: dataframe[dimension].astype("category")
+                            for dimension in self.dimensions
+                        },
+                        **{
+                            measure: parse_measure(dataframe[measure], type)
+                            for measure, type in self.measures.items()
+                            if measure in dataframe.columns
+                        },
+                    },
+                    index=dataframe.index,
+                ),
+                # Columns without numeric type are summed like without measures
+                self.to_numeric(dataframe[others]),
+            ],
+            axis=1,
+        )
+
+    def result(self) -> pd.DataFrame:
+        dataframe = self.drop_invalid_columns(self.partial)
+
+        if self.aggregate_by == "total":
+            dataframe = dataframe.astype(
+                {
+                    column: int
+                    for column in dataframe.columns
+                    if column not in self.measures
+                }
+            )
+            dataframe["id"] = 0
+        elif self.measures:
+            dataframe = dataframe.astype(self.dimension_dtypes)
+
+        return dataframe
+
+    def sum(self, dataframe: pd.DataFrame) -> pd.DataFrame:
+        if self.aggregate_by == "total":
+            if self.measures:
+                # Sum per column, so that each sum keeps a numeric type wide enough for it
+                return pd.DataFrame(
+                    {column: [dataframe[column].sum()] for column in dataframe.columns}
+                )
+            return pd.DataFrame(dataframe.sum()).transpose()
+        elif self.measures:
+            return dataframe.groupby(
+                self.dimensions, as_index=False, observed=True
+            ).sum()
+        else:
+            return dataframe.groupby(self.aggregate_by, as_index=False).sum()
+
+    def drop_invalid_columns(self, dataframe: pd.DataFrame) -> pd.DataFrame:
+        return dataframe.drop(
+            columns=[
+                column for column in dataframe.columns if column in self.invalid_columns
+            ]
+        )
+
+
+def parse_measure(column: pd.Series, type) -> pd.Series:
+    """
+    Parses a measure into its declared numeric type, integer measures with missing values become nullable
+    :param column: column
+    :param type: numeric type
+    :return: parsed column
+    """
+    dtype = pandas_dtype(type)
+
+    if not is_numeric_dtype(column.dtype):
+        column = pd.to_numeric(column, errors="coerce")
+
+    if (
+        is_integer_dtype(dtype)
+        and not isinstance(dtype, pd.api.extensions.ExtensionDtype)
+        and column.isna().any()
+    ):
+        dtype = pandas_dtype(dtype.name.replace("uint", "UInt").replace("int", "Int"))
+
+    return column.astype(dtype)
+
+
+def build_fraction_step(names: List[Name]) -> Optional[Step]:
+    fraction_names = [name for name in names if name.numerator and name.denominator]
+
+    if not fraction_names:
+        return None
+
+    def apply(dataframe, context):
+        for name in [
+            name
+            for name in fraction_names
+            if name.numerator in dataframe.columns
+            and name.denominator in dataframe.columns
+        ]:
+            dataframe[name.name] = (
+                dataframe[name.numerator]
+                .astype(float)
+                .divide(dataframe[name.denominator].astype(float))
+                .multiply(100)
+                .fillna(0)
+            )
+        return dataframe
+
+    return Step(
+        "fraction",
+        ", ".join(name.name for name in fraction_names),
+        COST_COLUMN,
+        apply,
+        reads={
+            column
+            for name in fraction_names
+            for column in [name.numerator, name.denominator]
+        },
+        writes={name.name for name in fraction_names},
+    )
+
+
+def build_mapping_step(names: List[Name]) -> Optional[Step]:
+    mapping_names = [name for name in names if name.mapping]
+
+    if not mapping_names:
+        return None
+
+    def apply(dataframe, context):
+        for name in mapping_names:
+            dataframe[name.name] = dataframe[name.key].map(name.mapping)
+        return dataframe
+
+    return Step(
+        "mapping",
+        ", ".join(name.name for name in mapping_names),
+        COST_COLUMN,
+        apply,
+        reads={name.key for name in mapping_names},
+        writes={name.name for name in mapping_names},
+    )
+
+
+def build_select_step(names: List[Name]) -> Step:
+    def apply(dataframe, context):
+        # Apply remove
+        dataframe = dataframe.filter(
+            items=[
+                name.name
+                for name in names
+                if name.name in dataframe.columns and not name.remove
+            ]
+        )
+
+        # Apply rename
+        dataframe = dataframe.rename(
+            columns={name.name: name.rename for name in names if name.rename}
+        )
+
+        # Move ID column to first position
+        if "id" not in dataframe.columns.tolist():
+            dataframe["id"] = 0
+        dataframe.insert(0, "id", dataframe.pop("id"))
+        return dataframe
+
+    return Step(
+        "select",
+        "remove, rename and move id to first position",
+        COST_COLUMN,
+        apply,
+        writes=None,
+    )
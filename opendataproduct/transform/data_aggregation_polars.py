@@ -0,0 +1,665 @@
+import os
+from typing import List, Optional
+
+import pandas as pd
+import polars as pl
+from pandas.api.types import pandas_dtype
+
+from opendataproduct.config.data_transformation_gold_loader import File, Filter
+from opendataproduct.transform.data_aggregation_plan import (
+    AggregationPlan,
+    ExecutionContext,
+    Step,
+    apply_step,
+    build_measures,
+    profile,
+)
+
+# Characters removed by str.strip()
+WHITESPACE = "".join(chr(code) for code in range(0x110000) if chr(code).isspace())
+
+# Characters pd.to_numeric ignores around numbers
+NUMBER_WHITESPACE = " \t\n\r\v\f"
+
+# Polars types of pandas types whose values and sums are the same in both libraries
+POLARS_TYPES = {
+    "int8": pl.Int8,
+    "int16": pl.Int16,
+    "int32": pl.Int32,
+    "int64": pl.Int64,
+    "uint8": pl.UInt8,
+    "uint16": pl.UInt16,
+    "uint32": pl.UInt32,
+    "uint64": pl.UInt64,
+    "float32": pl.Float32,
+    "float64": pl.Float64,
+}
+
+
+class UnsupportedStep(Exception):
+    """
+    Raised for steps whose result in polars could differ from the result in pandas
+    """
+
+
+class UnsupportedSource(Exception):
+    """
+    Raised for sources that polars would read into other values than pandas
+    """
+
+
+def execute_polars_plan(
+    plan: AggregationPlan,
+    file: File,
+    source_file_path,
+    context: ExecutionContext,
+    columns=None,
+) -> Optional[pd.DataFrame]:
+    """
+    Executes a plan as polars lazy query. Leading steps that polars evaluates with the same result as pandas are
+    translated into one query on a scan of the source, so that projections and predicates are pushed down into the
+    scan and the query runs multithreaded. The query is collected once, an aggregation is applied to the collected
+    data since the columns it sums depend on their values. The remaining steps, such as spatial lookups and everything
+    after an aggregation, are applied with pandas
+    :param plan: aggregation plan
+    :param file: file the plan is compiled from
+    :param source_file_path: file path of csv or parquet file
+    :param context: execution context
+    :param columns: names of columns to read, all columns if not set
+    :return: dataframe, None if polars cannot process the source
+    """
+    steps = list(plan.steps)
+
+    try:
+        query = PolarsQuery(file, scan_source_file(source_file_path, columns))
+
+        while steps:
+            try:
+                query.add(steps[0])
+            except UnsupportedStep:
+                break
+            steps.pop(0)
+
+        dataframe = profile(
+            context,
+            "polars",
+            lambda _: query.collect(),
+            None,
+            ", ".join(query.operations),
+        )
+    except (UnsupportedSource, pl.exceptions.PolarsError):
+        # Also raised by casts that fail on values that pandas would keep as strings
+        return None
+
+    for step in query.remaining_steps + steps:
+        dataframe = apply_step(step, dataframe, context)
+    return dataframe
+
+
+def scan_source_file(file_path, columns=None) -> pl.LazyFrame:
+    """
+    Scans a silver file into string columns with the values pandas reads with dtype=str and keep_default_na=False
+    :param file_path: file path of csv or parquet file
+    :param columns: names of columns to read, others are skipped, all columns if not set
+    :return: lazy frame
+    """
+    _, extension = os.path.splitext(file_path)
+
+    if extension == ".parquet":
+        lazy_frame = pl.scan_parquet(file_path)
+    elif has_blank_lines(file_path):
+        # Pandas skips blank lines, polars reads them as rows of empty strings
+        raise UnsupportedSource(file_path)
+    else:
+        lazy_frame = pl.scan_csv(
+            file_path, infer_schema=False, empty_string_is_null=False
+        )
+
+    schema = lazy_frame.collect_schema()
+
+    return lazy_frame.select(
+        to_strings(column, dtype)
+        for column, dtype in schema.items()
+        if columns is None or column in columns
+    )
+
+
+def to_strings(column, dtype: pl.DataType) -> pl.Expr:
+    """
+    Renders a column as strings like pandas writes it to csv, missing values become empty strings
+    :param column: column name
+    :param dtype: type of the column
+    :return: string column
+    """
+    if dtype == pl.String:
+        return pl.col(column).fill_null("")
+    if dtype.is_integer() or dtype == pl.Categorical:
+        return pl.col(column).cast(pl.String).fill_null("")
+
+    # Floats, booleans and dates are rendered differently by polars
+    raise UnsupportedSource(column)
+
+
+def has_blank_lines(file_path) -> bool:
+    with open(file_path, "rb") as file:
+        # Also finds a blank line before the header
+        previous = b"\n"
+        for chunk in iter(lambda: file.read(1024 * 1024), b""):
+            # Blank lines inside quoted values are also found, which only prevents using polars
+            text = (previous + chunk).replace(b"\r\n", b"\n")
+            if b"\n\n" in text:
+                return True
+            previous = chunk[-2:]
+    return False
+
+
+class PolarsQuery(object):
+    """
+    Translates the steps of an aggregation plan into a polars lazy query. An aggregation, whose result depends on
+    values, is applied after collecting the query, so that its translation can be checked against the data
+    """
+
+    def __init__(self, file: File, lazy_frame: pl.LazyFrame):
+        self.names = file.names or []
+        self.aggregate_by = file.aggregate_by
+        self.with_measures = file.aggregate_measures
+        self.lazy_frame = lazy_frame
+        # Pandas types of columns that polars has no equivalent for
+        self.dtypes = {}
+        self.operations = []
+        self.aggregation_step = None
+        # Steps that are left to pandas after collecting the query
+        self.remaining_steps = []
+
+    def add(self, step: Step):
+        translate = {
+            "trim": self.trim,
+            "type": self.type,
+            "value": self.value,
+            "concat": self.concat,
+            "split": self.split,
+            "filter": self.filter,
+            "copy_zfill_lstrip": self.copy_zfill_lstrip,
+            "copy_zfill": lambda step: self.copy_zfill_lstrip(step, lstrip=False),
+            "aggregation": self.aggregation,
+        }.get(step.operation)
+
+        # Aggregated results are small, so that the remaining steps are left to pandas
+        if translate is None or self.aggregation_step is not None:
+            raise UnsupportedStep(step.operation)
+
+        self.lazy_frame = translate(step)
+        self.operations.append(step.operation)
+
+    def collect(self) -> pd.DataFrame:
+        dataframe = self.lazy_frame.collect()
+
+        if self.aggregation_step is not None:
+            try:
+                dataframe = self.aggregate(dataframe)
+            except UnsupportedStep:
+                self.remaining_steps.append(self.aggregation_step)
+                self.operations.remove("aggregation")
+
+        dataframe = dataframe.to_pandas()
+        return dataframe.astype(self.dtypes) if self.dtypes else dataframe
+
+    def schema(self, lazy_frame: pl.LazyFrame = None) -> pl.Schema:
+        return (
+            lazy_frame if lazy_frame is not None else self.lazy_frame
+        ).collect_schema()
+
+    def trim(self, step: Step) -> pl.LazyFrame:
+        return self.lazy_frame.with_columns(
+            pl.col(pl.String).str.strip_chars(WHITESPACE)
+        )
+
+    def type(self, step: Step) -> pl.LazyFrame:
+        schema = self.schema()
+        dtypes = {
+            name.name: get_polars_type(name.type)
+            for name in self.names
+            if name.type not in [None, "str"] and name.name in schema
+        }
+
+        if any(
+            schema[column] not in [dtype, pl.String] for column, dtype in dtypes.items()
+        ):
+            raise UnsupportedStep("type")
+
+        # Casts fail when the query is collected if a value cannot be converted, pandas then keeps the strings
+        return self.lazy_frame.with_columns(
+            cast_all_rows(pl.col(column), dtype)
+            for column, dtype in dtypes.items()
+            if schema[column] != dtype
+        )
+
+    def value(self, step: Step) -> pl.LazyFrame:
+        return self.lazy_frame.with_columns(
+            pl.lit(name.value, dtype=get_literal_type(name.value)).alias(name.name)
+            for name in self.names
+            if name.value
+        )
+
+    def concat(self, step: Step) -> pl.LazyFrame:
+        lazy_frame = self.lazy_frame
+
+        for name in [name for name in self.names if name.concat]:
+            schema = self.schema(lazy_frame)
+            if len(name.concat) < 2 or any(
+                schema.get(column) != pl.String for column in name.concat
+            ):
+                raise UnsupportedStep("concat")
+
+            lazy_frame = lazy_frame.with_columns(
+                pl.concat_str(name.concat, separator=name.concat_delimiter or "").alias(
+                    name.name
+                )
+            )
+
+        return lazy_frame
+
+    def split(self, step: Step) -> pl.LazyFrame:
+        lazy_frame = self.lazy_frame
+
+        for name in [name for name in self.names if name.split]:
+            if self.schema(lazy_frame).get(name.split.name) != pl.String:
+                raise UnsupportedStep("split")
+
+            lazy_frame = lazy_frame.with_columns(
+                slice_strings(
+                    pl.col(name.split.name), name.split.last_n, name.split.first_n
+                ).alias(name.name)
+            )
+
+        return lazy_frame
+
+    def filter(self, step: Step) -> pl.LazyFrame:
+        schema = self.schema()
+
+        if any(filter.key not in schema for filter in step.filters):
+            raise UnsupportedStep("filter")
+
+        return self.lazy_frame.filter(
+            *[
+                build_filter_expression(filter, schema[filter.key])
+                for filter in step.filters
+            ]
+        )
+
+    def copy_zfill_lstrip(self, step: Step, lstrip=True) -> pl.LazyFrame:
+        lazy_frame = self.lazy_frame
+
+        # Copy all columns before any of them is zero-filled or stripped
+        for name in [name for name in self.names if name.copy]:
+            if name.copy in self.schema(lazy_frame):
+                lazy_frame = lazy_frame.with_columns(pl.col(name.copy).alias(name.name))
+        schema = self.schema(lazy_frame)
+
+        for name in [
+            name
+            for name in self.names
+            if (name.zfill or (lstrip and name.lstrip)) and name.name in schema
+        ]:
+            if schema[name.name] == pl.String:
+                column = pl.col(name.name)
+            elif schema[name.name].is_integer():
+                column = pl.col(name.name).cast(pl.String)
+            else:
+                raise UnsupportedStep("copy_zfill_lstrip")
+
+            if name.zfill:
+                column = column.str.zfill(name.zfill)
+            if lstrip and name.lstrip:
+                column = column.str.strip_chars_start(name.lstrip)
+            lazy_frame = lazy_frame.with_columns(column.alias(name.name))
+
+        return lazy_frame
+
+    def aggregation(self, step: Step) -> pl.LazyFrame:
+        # Applied when the query is collected
+        self.aggregation_step = step
+        return self.lazy_frame
+
+    def aggregate(self, dataframe: pl.DataFrame) -> pl.DataFrame:
+        dimensions = (
+            []
+            if self.aggregate_by == "total"
+            else (
+                [self.aggregate_by]
+                if isinstance(self.aggregate_by, str)
+                else list(self.aggregate_by)
+            )
+        )
+        measures = (
+            {
+                name: type
+                for name, type in build_measures(self.names).items()
+                if name not in dimensions
+            }
+            if self.with_measures
+            else {}
+        )
+
+        # Whether measures are integers depends on their values
+        if measures:
+            return self.aggregate_measures(dataframe, dimensions, measures)
+        return self.aggregate_numeric_columns(dataframe, dimensions)
+
+    def aggregate_measures(
+        self, dataframe: pl.DataFrame, dimensions: List[str], measures: dict
+    ) -> pl.DataFrame:
+        if any(
+            dimension not in dataframe.columns
+            or not (
+                dataframe.schema[dimension] == pl.String
+                or dataframe.schema[dimension].is_integer()
+            )
+            # Pandas drops groups with missing values
+            or dataframe[dimension].null_count() > 0
+            for dimension in dimensions
+        ):
+            raise UnsupportedStep("aggregation")
+
+        values = {}
+        dtypes = {}
+
+        for measure, type in measures.items():
+            if measure not in dataframe.columns:
+                continue
+            if dataframe.schema[measure] != pl.String:
+                raise UnsupportedStep("aggregation")
+
+            # Floating point sums depend on the order of additions, which differs between pandas and polars
+            if pandas_dtype(type).name != "int64":
+                raise UnsupportedStep("aggregation")
+
+            values[measure], nullable = parse_integers(dataframe[measure])
+            if nullable:
+                dtypes[measure] = "Int64"
+
+        # Columns without numeric type are summed like without measures
+        values.update(
+            parse_numeric_columns(
+                dataframe,
+                [
+                    column
+                    for column in dataframe.columns
+                    if column not in dimensions and column not in measures
+                ],
+            )
+        )
+
+        if not values or dataframe.height == 0:
+            raise UnsupportedStep("aggregation")
+
+        values_frame = pl.DataFrame(
+            [dataframe[dimension] for dimension in dimensions] + list(values.values())
+        )
+
+        if self.aggregate_by == "total":
+            # Total sums never have missing values
+            return values_frame.select(
+                pl.col(column).sum() for column in values
+            ).with_columns(id=pl.lit(0, dtype=pl.Int64))
+
+        self.dtypes = dtypes
+        return (
+            values_frame.group_by(dimensions)
+            .agg(pl.col(column).sum() for column in values)
+            .sort(dimensions)
+        )
+
+    def aggregate_numeric_columns(
+        self, dataframe: pl.DataFrame, dimensions: List[str]
+    ) -> pl.DataFrame:
+        values = parse_numeric_columns(dataframe, dataframe.columns)
+
+        # Pandas fails if a column to aggregate by is not numeric
+        if (
+            not values
+            or dataframe.height == 0
+            or any(dimension not in values for dimension in dimensions)
+        ):
+            raise UnsupportedStep("aggregation")
+
+        values_frame = pl.DataFrame(values)
+
+        if self.aggregate_by == "total":
+            return values_frame.select(
+                pl.col(column).sum() for column in values
+            ).with_columns(id=pl.lit(0, dtype=pl.Int64))
+
+        return (
+            values_frame.group_by(dimensions)
+            .agg(pl.col(column).sum() for column in values if column not in dimensions)
+            .sort(dimensions)
+        )
+
+
+def parse_numeric_columns(dataframe: pl.DataFrame, columns: List[str]) -> dict:
+    """
+    Parses columns into integers like pd.to_numeric(errors="coerce"), columns that are not fully numeric are skipped
+    :param dataframe: dataframe
+    :param columns: names of columns to parse
+    :return: integer columns by name
+    """
+    values = {}
+
+    for column in columns:
+        if dataframe.schema[column] == pl.Int64:
+            values[column] = dataframe[column]
+        elif dataframe.schema[column] == pl.String:
+            stripped = dataframe[column].str.strip_chars(NUMBER_WHITESPACE)
+            integers = stripped.cast(pl.Int64, strict=False)
+            if integers.null_count() == 0:
+                values[column] = integers
+            elif (
+                stripped.cast(pl.Float64, strict=False).fill_nan(None).null_count() == 0
+            ):
+                # Floating point sums depend on the order of additions
+                raise UnsupportedStep("aggregation")
+        elif dataframe.schema[column] != pl.Boolean:
+            raise UnsupportedStep("aggregation")
+
+    return values
+
+
+def get_polars_type(type) -> pl.DataType:
+    try:
+        return POLARS_TYPES[pandas_dtype(type).name]
+    except (KeyError, TypeError):
+        raise UnsupportedStep("type")
+
+
+def get_literal_type(value) -> pl.DataType:
+    if isinstance(value, bool):
+        return pl.Boolean
+    if isinstance(value, int) and -(2**63) <= value < 2**63:
+        return pl.Int64
+    if isinstance(value, float):
+        return pl.Float64
+    if isinstance(value, str):
+        return pl.String
+    raise UnsupportedStep("value")
+
+
+def cast_all_rows(column: pl.Expr, dtype: pl.DataType) -> pl.Expr:
+    """
+    Converts strings into a numeric type, fails if any value of the column cannot be converted. Since the result
+    depends on all rows, polars does not push filters ahead of the cast, which pandas applies to the whole column
+    :param column: string column
+    :param dtype: numeric type
+    :return: converted column
+    """
+    converted = cast_strings(column, dtype, strict=False)
+    return (
+        pl.when((converted.is_null() & column.is_not_null()).any())
+        .then(cast_strings(column, dtype))
+        .otherwise(converted)
+    )
+
+
+def cast_strings(column: pl.Expr, dtype: pl.DataType, strict=True) -> pl.Expr:
+    """
+    Converts strings into a numeric type
+    :param column: string column
+    :param dtype: numeric type
+    :param strict: True to fail if a value cannot be converted, False to convert it into null
+    :return: converted column
+    """
+    if dtype == pl.Float32:
+        # Numpy parses into float64 first
+        return column.cast(pl.Float64, strict=strict).cast(pl.Float32, strict=strict)
+    return column.cast(dtype, strict=strict)
+
+
+def parse_numbers(column: pl.Expr) -> pl.Expr:
+    """
+    Parses strings into floats like pd.to_numeric(errors="coerce"), values that cannot be parsed become null
+    :param column: string column
+    :return: float column
+    """
+    return (
+        column.str.strip_chars(NUMBER_WHITESPACE)
+        .cast(pl.Float64, strict=False)
+        .fill_nan(None)
+    )
+
+
+def parse_integers(column: pl.Series) -> tuple[pl.Series, bool]:
+    """
+    Parses a string measure into integers like pd.to_numeric(errors="coerce") followed by astype(int)
+    :param column: string column
+    :return: integer column and whether it has missing values
+    """
+    stripped = column.str.strip_chars(NUMBER_WHITESPACE)
+    integers = stripped.cast(pl.Int64, strict=False)
+
+    if integers.null_count() == 0:
+        return integers, False
+
+    # Pandas parses all values as floats once one of them is not an integer
+    floats = stripped.cast(pl.Float64, strict=False).fill_nan(None)
+    if floats.null_count() > 0 and (floats != floats.floor()).any():
+        # Converting floats with missing values to nullable integers fails for fractions
+        raise UnsupportedStep("aggregation")
+    if floats.is_infinite().any() or (floats.abs() >= 2**63).any():
+        raise UnsupportedStep("aggregation")
+
+    return floats.cast(pl.Int64), floats.null_count() > 0
+
+
+def slice_strings(column: pl.Expr, start: Optional[int], stop: Optional[int]):
+    """
+    Slices strings like str[start:stop]
+    :param column: string column
+    :param start: start
+    :param stop: stop
+    :return: sliced column
+    """
+    if (start is None or start >= 0) and stop is None:
+        return column.str.slice(start or 0)
+    if (start is None or start >= 0) and stop >= 0:
+        return column.str.slice(start or 0, max(stop - (start or 0), 0))
+    if not start and stop < 0:
+        return column.str.head(stop)
+    if start < 0 and stop is None:
+        return column.str.tail(-start)
+    raise UnsupportedStep("split")
+
+
+def build_filter_expression(filter: Filter, dtype: pl.DataType) -> pl.Expr:
+    """
+    Translates a filter into an expression that evaluates to the same mask as build_filter_mask
+    :param filter: filter
+    :param dtype: type of the filtered column
+    :return: expression
+    """
+    operation = filter.operation
+    column = pl.col(filter.key)
+    is_string = dtype == pl.String
+
+    if not is_string and not dtype.is_numeric():
+        raise UnsupportedStep("filter")
+
+    try:
+        if operation in ["equals", "does_not_equal"]:
+            result = column == normalize_value(dtype, filter.value)
+        elif operation in ["starts_with", "does_not_start_with"] and is_string:
+            result = column.str.starts_with(get_string(filter.value))
+        elif operation in ["ends_with", "does_not_end_with"] and is_string:
+            result = column.str.ends_with(get_string(filter.value))
+        elif operation in ["in", "not_in"]:
+            values = [normalize_value(dtype, value) for value in filter.value or []]
+            result = (
+                column.is_in(values)
+                if is_string
+                else column.cast(pl.Float64).is_in([float(value) for value in values])
+            )
+        elif operation == "between":
+            values = (
+                parse_numbers(column)
+                if is_string
+                else column.cast(pl.Float64).fill_nan(None)
+            )
+            result = pl.lit(True)
+            if filter.min is not None:
+                result &= values >= filter.min
+            if filter.max is not None:
+                result &= values <= filter.max
+        elif operation in [
+            "greater_than",
+            "greater_than_or_equal",
+            "less_than",
+            "less_than_or_equal",
+        ]:
+            values = (
+                parse_numbers(column)
+                if is_string
+                else column.cast(pl.Float64).fill_nan(None)
+            )
+            value = float(filter.value)
+            result = {
+                "greater_than": values > value,
+                "greater_than_or_equal": values >= value,
+                "less_than": values < value,
+                "less_than_or_equal": values <= value,
+            }[operation]
+        elif operation in ["is_null", "is_not_null"]:
+            result = column.is_null()
+            if is_string:
+                result |= column == ""
+            elif dtype.is_float():
+                result |= column.is_nan()
+        else:
+            raise UnsupportedStep("filter")
+    except (ValueError, TypeError):
+        # Pandas raises the error when the step is applied
+        raise UnsupportedStep("filter")
+
+    # Treat missing results as not matching
+    result = result.fill_null(False)
+
+    return (
+        ~result
+        if operation.startswith("does_not_") or operation in ["not_in", "is_not_null"]
+        else result
+    )
+
+
+def normalize_value(dtype: pl.DataType, value):
+    if dtype == pl.String:
+        return str(value)
+
+    value = pd.to_numeric(value)
+    if pd.isna(value):
+        # Pandas never matches missing values
+        raise UnsupportedStep("filter")
+    return value.item() if hasattr(value, "item") else value
+
+
+def get_string(value) -> str:
+    if not isinstance(value, str):
+        raise UnsupportedStep("filter")
+    return value
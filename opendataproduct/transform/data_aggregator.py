@@ -1,14 +1,39 @@
-import json
 import os
-import math
 import pandas as pd
 from opendataproduct.config.data_transformation_gold_loader import (
     DataTransformation,
 )
+from opendataproduct.operation_profiler import OperationProfiler
 from opendataproduct.tracking_decorator import TrackingDecorator
-from pyproj import Transformer
-from shapely.geometry.point import Point
-from shapely.geometry.polygon import Polygon
+from opendataproduct.transform.column_statistics import (
+    build_statistics_file_path,
+    write_column_statistics,
+)
+from opendataproduct.transform.data_aggregation_plan import (
+    ExecutionContext,
+    build_source_columns,
+    compile_aggregation_plan,
+)
+from opendataproduct.transform.data_reader import get_silver_parquet_file_path
+from opendataproduct.transform.data_writer import (
+    ParquetOptions,
+    append_parquet_partition,
+    build_partition_path,
+    write_data,
+)
+from opendataproduct.transform.geodata_writer import (
+    GEODATA_FORMATS,
+    join_template_features,
+    load_geojson_template,
+    write_geodata,
+)
+from opendataproduct.transform.geojson_feature_cache import GeojsonFeatureCache
+from opendataproduct.transform.string_operations import (
+    iter_csv_as_strings,
+    iter_parquet_as_strings,
+    read_csv_as_arrow_strings,
+    read_parquet_as_strings,
+)
 
 
 @TrackingDecorator.track_time
@@ -17,26 +42,73 @@ def aggregate_data(
     source_path,
     results_path,
     geojson_path=None,
+    dtype_backend=None,
+    chunk_size=None,
+    csv_engine=None,
+    parquet_options: ParquetOptions = None,
+    explain=False,
+    profile_file_path=None,
+    engine=None,
+    statistics=False,
+    period=None,
+    geodata_formats=None,
+    coordinate_precision=6,
     clean=False,
     quiet=False,
 ):
     already_exists, converted, exception = 0, 0, 0
 
+    for geodata_format in geodata_formats or []:
+        if geodata_format not in GEODATA_FORMATS:
+            raise ValueError(f"✗️ Geodata format {geodata_format} is not supported")
+
+    # Fail before writing any outputs if a cumulative dataset cannot be appended to
+    if period is None:
+        for input_port in data_transformation.input_ports or []:
+            for file in input_port.files or []:
+                if file.cumulative_file_name is not None:
+                    raise ValueError(
+                        f"✗️ Period is required to append to {file.cumulative_file_name}"
+                    )
+
+    if engine == "polars":
+        if dtype_backend == "pyarrow":
+            raise ValueError("✗️ Polars engine does not support dtype_backend pyarrow")
+        if chunk_size is not None:
+            raise ValueError("✗️ Polars engine does not support chunk_size")
+
+        # Polars is only required when it is selected as engine
+        from opendataproduct.transform.data_aggregation_polars import (
+            execute_polars_plan,
+        )
+
+    # Records time, rows and memory of each operation if a report is requested
+    profiler = OperationProfiler(
+        "aggregate_data", enabled=profile_file_path is not None
+    )
+
+    # Spatial indices of geojson templates, loaded once per run
+    geojson_feature_indices = {}
+    # Features of geojson templates that gold geodata files are joined to, loaded once per run
+    geojson_templates = {}
+    geojson_feature_cache = (
+        GeojsonFeatureCache(os.path.join(geojson_path, "geojson-feature-cache.sqlite"))
+        if geojson_path is not None
+        else None
+    )
+
     for input_port in data_transformation.input_ports or []:
         for file in input_port.files or []:
             file_name, _ = os.path.splitext(file.target_file_name)
             target_file_name_csv = f"{file_name}.csv"
             target_file_name_parquet = f"{file_name}.parquet"
 
-            if geojson_path is not None:
-                geojson_template_file_path = (
-                    os.path.join(geojson_path, file.geojson_template_file_name)
-                    if file.geojson_template_file_name is not None
-                    else None
-                )
-                geojson_feature_cache_file_path = os.path.join(
-                    geojson_path, "geojson-feature-cache.csv"
-                )
+            geojson_template_file_path = (
+                os.path.join(geojson_path, file.geojson_template_file_name)
+                if geojson_path is not None
+                and file.geojson_template_file_name is not None
+                else None
+            )
 
             source_file_path = os.path.join(
                 source_path, input_port.id, file.source_file_name
@@ -46,16 +118,67 @@ def aggregate_data(
                 f"{input_port.id.replace("-csv", "")}-csv",
                 target_file_name_csv,
             )
+            # Partitioned datasets are written into a directory named after the file
             target_file_path_parquet = os.path.join(
                 results_path,
                 f"{input_port.id.replace("-csv", "")}-parquet",
-                target_file_name_parquet,
+                target_file_name_parquet if not file.partition_by else file_name,
+            )
+            target_file_path_statistics = build_statistics_file_path(
+                target_file_path_csv
+            )
+            target_file_path_cumulative = (
+                os.path.join(
+                    results_path,
+                    f"{input_port.id.replace("-csv", "")}-parquet",
+                    os.path.splitext(file.cumulative_file_name)[0],
+                )
+                if file.cumulative_file_name is not None
+                else None
+            )
+            # Geodata files are only written for files that have a geojson template
+            target_file_path_geojson = (
+                os.path.join(
+                    results_path,
+                    f"{input_port.id.replace("-csv", "")}-geojson",
+                    f"{file_name}.geojson",
+                )
+                if geojson_template_file_path is not None
+                and "geojson" in (geodata_formats or [])
+                else None
+            )
+            target_file_path_geoparquet = (
+                os.path.join(
+                    results_path,
+                    f"{input_port.id.replace("-csv", "")}-geoparquet",
+                    f"{file_name}.parquet",
+                )
+                if geojson_template_file_path is not None
+                and "geoparquet" in (geodata_formats or [])
+                else None
             )
 
             if (
                 not clean
                 and os.path.exists(target_file_path_csv)
                 and os.path.exists(target_file_path_parquet)
+                and (not statistics or os.path.exists(target_file_path_statistics))
+                and (
+                    target_file_path_geojson is None
+                    or os.path.exists(target_file_path_geojson)
+                )
+                and (
+                    target_file_path_geoparquet is None
+                    or os.path.exists(target_file_path_geoparquet)
+                )
+                and (
+                    target_file_path_cumulative is None
+                    or os.path.exists(
+                        os.path.join(
+                            target_file_path_cumulative, build_partition_path(period)
+                        )
+                    )
+                )
             ):
                 already_exists += 1
                 not quiet and print(
@@ -63,317 +186,187 @@ def aggregate_data(
                 )
                 continue
 
-            try:
-                with open(source_file_path, "r") as csv_file:
-                    # Read csv file
-                    dataframe = pd.read_csv(csv_file, dtype=str, keep_default_na=False)
+            profiler.start_file(file.target_file_name)
 
-                    # Apply trim
-                    dataframe = dataframe.map(
-                        lambda col: col.strip() if isinstance(col, str) else col
-                    )
+            # Prefer typed parquet file written next to the silver csv file unless the csv file is newer
+            source_file_path_parquet = get_silver_parquet_file_path(source_file_path)
+            source_columns = build_source_columns(file)
+            is_parquet_source = source_file_path_parquet is not None
 
-                    # Apply data type
-                    dataframe = dataframe.astype(
-                        {
-                            name.name: name.type
-                            for name in file.names
-                            if name.name in dataframe.columns
-                        },
-                        errors="ignore",
-                    )
+            try:
+                # Silver parquet files are already trimmed
+                plan = compile_aggregation_plan(file, trim=not is_parquet_source)
+                not quiet and explain and print(plan.explain())
+                context = ExecutionContext(
+                    geojson_template_file_path=geojson_template_file_path,
+                    geojson_feature_cache=geojson_feature_cache,
+                    geojson_feature_indices=geojson_feature_indices,
+                    profiler=profiler if profiler.enabled else None,
+                )
 
-                    # Apply value
-                    for name in [name for name in file.names if name.value]:
-                        dataframe[name.name] = name.value
+                # Run plan as polars query, which falls back to pandas if polars cannot process the source
+                dataframe = (
+                    execute_polars_plan(
+                        plan,
+                        file,
+                        (
+                            source_file_path_parquet
+                            if is_parquet_source
+                            else source_file_path
+                        ),
+                        context,
+                        columns=source_columns,
+                    )
+                    if engine == "polars"
+                    else None
+                )
 
-                    # Apply coordinate transformation
-                    for name in [name for name in file.names if name.transform_lon]:
-                        dataframe[name.name] = dataframe.apply(
-                            lambda row: transform_lon(
-                                row[name.transform_lon[0]],
-                                row[name.transform_lon[1]],
-                                name.transform_source,
-                                name.transform_target,
+                if dataframe is None:
+                    if chunk_size is not None and is_parquet_source:
+                        # Stream referenced columns of parquet file chunk by chunk
+                        dataframe = plan.execute_chunks(
+                            lambda: profiler.iterate(
+                                "read",
+                                iter_parquet_as_strings(
+                                    source_file_path_parquet,
+                                    chunk_size,
+                                    columns=source_columns,
+                                    dtype_backend=dtype_backend,
+                                ),
                             ),
-                            axis=1,
+                            context,
                         )
-                    for name in [name for name in file.names if name.transform_lat]:
-                        dataframe[name.name] = dataframe.apply(
-                            lambda row: transform_lat(
-                                row[name.transform_lat[0]],
-                                row[name.transform_lat[1]],
-                                name.transform_source,
-                                name.transform_target,
+                    elif chunk_size is not None:
+                        # Stream csv file and apply transformation plan chunk by chunk
+                        dataframe = plan.execute_chunks(
+                            lambda: profiler.iterate(
+                                "read",
+                                iter_csv_as_strings(
+                                    source_file_path,
+                                    chunk_size,
+                                    dtype_backend=dtype_backend,
+                                ),
                             ),
-                            axis=1,
+                            context,
                         )
-
-                    # Apply geojson lookup
-                    for name in [name for name in file.names if name.geojson_lookup]:
-                        dataframe[name.name] = dataframe.apply(
-                            lambda row: lookup_geojson_feature(
-                                geojson_template_file_path,
-                                geojson_feature_cache_file_path,
-                                [
-                                    row[name.geojson_lookup[0]],
-                                    row[name.geojson_lookup[1]],
-                                ],
+                    else:
+                        # Read parquet or csv file
+                        dataframe = profiler.run(
+                            "read",
+                            lambda _: read_source_file(
+                                (
+                                    source_file_path_parquet
+                                    if is_parquet_source
+                                    else source_file_path
+                                ),
+                                columns=source_columns,
+                                dtype_backend=dtype_backend,
                             ),
-                            axis=1,
                         )
-                        dataframe[name.name] = dataframe[name.name].astype(str)
 
-                    # Apply concatenation
-                    for name in [name for name in file.names if name.concat]:
-                        dataframe[name.name] = dataframe[name.concat].agg(
-                            name.concat_delimiter.join, axis=1
-                        )
-                        dataframe.insert(0, name.name, dataframe.pop(name.name))
-
-                    # Apply split
-                    for name in [name for name in file.names if name.split]:
-                        dataframe[name.name] = dataframe[name.split.name].str[
-                            name.split.last_n : name.split.first_n
-                        ]
-
-                    # Apply filter
-                    for filter in file.filters or []:
-                        if filter.operation == "equals":
-                            dataframe = dataframe[dataframe[filter.key] != filter.value]
-                        if filter.operation == "does_not_equal":
-                            dataframe = dataframe[dataframe[filter.key] != filter.value]
-                        if filter.operation == "starts_with":
-                            dataframe = dataframe[
-                                dataframe[filter.key].str.startswith(filter.value)
-                            ]
-                        if filter.operation == "does_not_start_with":
-                            dataframe = dataframe[
-                                ~dataframe[filter.key].str.startswith(filter.value)
-                            ]
-                        if filter.operation == "ends_with":
-                            dataframe = dataframe[
-                                dataframe[filter.key].str.endswith(filter.value)
-                            ]
-                        if filter.operation == "does_not_end_with":
-                            dataframe = dataframe[
-                                ~dataframe[filter.key].str.endswith(filter.value)
-                            ]
-
-                    # Apply copy
-                    for name in [
-                        name
-                        for name in file.names
-                        if name.copy and name.copy in dataframe.columns
-                    ]:
-                        dataframe[name.name] = dataframe[name.copy]
-                        dataframe.insert(0, name.name, dataframe.pop(name.name))
-
-                    # Apply zfill
-                    for name in [
-                        name
-                        for name in file.names
-                        if name.name in dataframe.columns and name.zfill
-                    ]:
-                        dataframe[name.name] = (
-                            dataframe[name.name].astype(str).str.zfill(name.zfill)
-                        )
-
-                    # Apply lstrip
-                    for name in [
-                        name
-                        for name in file.names
-                        if name.name in dataframe.columns and name.lstrip
-                    ]:
-                        dataframe[name.name] = (
-                            dataframe[name.name].astype(str).str.lstrip(name.lstrip)
-                        )
-
-                    # Apply aggregation
-                    if file.aggregate_by is not None:
-                        # Convert all to numeric and drop non-numeric columns
-                        dataframe = dataframe.apply(pd.to_numeric, errors="coerce")
-                        dataframe = dataframe.select_dtypes(include=["number"])
-                        dataframe = dataframe.dropna(axis=1, how="any")
-
-                        if file.aggregate_by != "total":
-                            dataframe = dataframe.groupby(
-                                file.aggregate_by, as_index=False
-                            ).sum()
-                        else:
-                            dataframe = (
-                                pd.DataFrame(dataframe.sum()).transpose().astype(int)
-                            )
-                            dataframe["id"] = 0
-
-                    # Apply copy
-                    for name in [
-                        name
-                        for name in file.names
-                        if name.copy and name.copy in dataframe.columns
-                    ]:
-                        dataframe[name.name] = dataframe[name.copy]
-                        dataframe.insert(0, name.name, dataframe.pop(name.name))
-
-                    # Apply zfill
-                    for name in [
-                        name
-                        for name in file.names
-                        if name.name in dataframe.columns and name.zfill
-                    ]:
-                        dataframe[name.name] = (
-                            dataframe[name.name].astype(str).str.zfill(name.zfill)
-                        )
-
-                    # Apply fraction
-                    for name in [
-                        name
-                        for name in file.names
-                        if name.numerator
-                        and name.numerator in dataframe.columns
-                        and name.denominator
-                        and name.denominator in dataframe.columns
-                    ]:
-                        dataframe[name.name] = (
-                            dataframe[name.numerator]
-                            .astype(float)
-                            .divide(dataframe[name.denominator].astype(float))
-                            .multiply(100)
-                            .fillna(0)
-                        )
-
-                    # Apply mapping
-                    for name in [name for name in file.names if name.mapping]:
-                        dataframe[name.name] = dataframe[name.key].map(name.mapping)
-                        dataframe.insert(0, name.name, dataframe.pop(name.name))
+                        # Apply transformation plan
+                        dataframe = plan.execute(dataframe, context)
+
+                # Save csv and parquet file
+                table = profiler.run(
+                    "write",
+                    lambda dataframe: write_data(
+                        dataframe,
+                        target_file_path_csv,
+                        target_file_path_parquet,
+                        csv_engine=csv_engine,
+                        parquet_options=parquet_options,
+                        partition_by=file.partition_by,
+                    ),
+                    dataframe,
+                )
 
-                    # Apply remove
-                    dataframe = dataframe.filter(
-                        items=[
-                            name.name
-                            for name in file.names
-                            if name.name in dataframe.columns and not name.remove
-                        ]
+                # Append period to cumulative dataset without rewriting previous periods
+                if target_file_path_cumulative is not None:
+                    profiler.run(
+                        "append",
+                        lambda _: append_parquet_partition(
+                            table,
+                            target_file_path_cumulative,
+                            period,
+                            parquet_options=parquet_options,
+                        ),
                     )
 
-                    # Apply rename
-                    for name in [
-                        name
-                        for name in file.names
-                        if name.name in dataframe.columns and name.rename
-                    ]:
-                        dataframe = dataframe.rename(columns={name.name: name.rename})
-
-                    # Move ID column to first position
-                    if "id" not in dataframe.columns.tolist():
-                        dataframe["id"] = 0
-                    dataframe.insert(0, "id", dataframe.pop("id"))
+                # Save column statistics computed from the table that has been written
+                if statistics:
+                    profiler.run(
+                        "statistics",
+                        lambda _: write_column_statistics(
+                            table,
+                            target_file_path_statistics,
+                            target_file_name_csv,
+                            dataframe,
+                        ),
+                    )
 
-                    # Save csv file
-                    os.makedirs(os.path.dirname(target_file_path_csv), exist_ok=True)
-                    dataframe.to_csv(target_file_path_csv, index=False)
+                # Save aggregated values joined to the features of the geojson template
+                if (
+                    target_file_path_geojson is not None
+                    or target_file_path_geoparquet is not None
+                ):
+                    if geojson_template_file_path not in geojson_templates:
+                        geojson_templates[geojson_template_file_path] = (
+                            load_geojson_template(geojson_template_file_path)
+                        )
 
-                    # Save parquet file
-                    os.makedirs(
-                        os.path.dirname(target_file_path_parquet), exist_ok=True
+                    profiler.run(
+                        "geodata",
+                        lambda dataframe: write_geodata(
+                            join_template_features(
+                                geojson_templates[geojson_template_file_path],
+                                dataframe,
+                            ),
+                            target_file_path_geojson,
+                            target_file_path_geoparquet,
+                            coordinate_precision=coordinate_precision,
+                            parquet_options=parquet_options,
+                        ),
+                        dataframe,
                     )
-                    dataframe.to_parquet(target_file_path_parquet, index=False)
 
-                    converted += 1
+                converted += 1
+                profiler.finish_file(dataframe)
 
-                    not quiet and print(
-                        f"✓ Convert {os.path.basename(target_file_path_csv)} / {os.path.basename(target_file_path_parquet)}"
-                    )
+                not quiet and print(
+                    f"✓ Convert {os.path.basename(target_file_path_csv)} / {os.path.basename(target_file_path_parquet)}"
+                )
             except Exception as e:
                 exception += 1
+                profiler.finish_file(status="exception")
                 print(f"✗️ Exception: {str(e)}")
-    print(
-        f"aggregate_data finished with already_exists: {already_exists}, converted: {converted}, exception: {exception}"
-    )
-
 
-def load_geojson_file(geojson_template_file_path):
-    with open(
-        file=geojson_template_file_path, mode="r", encoding="utf-8"
-    ) as geojson_file:
-        return json.load(geojson_file, strict=False)
+    # Persist geojson features looked up during this run
+    if geojson_feature_cache is not None:
+        geojson_feature_cache.flush()
 
+    profiler.write(profile_file_path)
 
-def load_csv_file(source_file_path):
-    with open(source_file_path, "r") as csv_file:
-        return pd.read_csv(csv_file, dtype=str)
-
-
-def transform_lon(source_lon, source_lat, transform_source, transform_target):
-    lon, _ = Transformer.from_crs(
-        transform_source, transform_target, always_xy=True
-    ).transform(source_lon, source_lat)
-    return lon
-
-
-def transform_lat(source_lon, source_lat, transform_source, transform_target):
-    _, lat = Transformer.from_crs(
-        transform_source, transform_target, always_xy=True
-    ).transform(source_lon, source_lat)
-    return lat
-
-
-def lookup_geojson_feature(
-    geojson_template_file_path, geojson_feature_cache_file_path, coords: []
-):
-    geojson = load_geojson_file(geojson_template_file_path)
-
-    # Read geojson feature cache
-    if os.path.exists(geojson_feature_cache_file_path):
-        geojson_feature_cache = load_csv_file(geojson_feature_cache_file_path)
-        geojson_feature_cache.set_index("latlon", inplace=True)
-    else:
-        geojson_feature_cache = pd.DataFrame(columns=["latlon", "geojson_feature_id"])
-        geojson_feature_cache.set_index("latlon", inplace=True)
-
-    lat = truncate(float(coords[0]), 4)
-    lon = truncate(float(coords[1]), 4)
+    print(
+        f"aggregate_data finished with already_exists: {already_exists}, converted: {converted}, exception: {exception}"
+    )
 
-    geojson_feature_cache_index = f"{lat}_{lon}"
 
-    # Check if geojson feature is already in cache
-    if geojson_feature_cache_index in geojson_feature_cache.index:
-        return geojson_feature_cache.loc[geojson_feature_cache_index][
-            "geojson_feature_id"
-        ]
+def read_source_file(file_path, columns=None, dtype_backend=None) -> pd.DataFrame:
+    """
+    Reads a silver file into string columns
+    :param file_path: file path of csv or parquet file
+    :param columns: names of columns to read from parquet file, csv files are read completely
+    :param dtype_backend: pyarrow to read arrow-backed string columns
+    :return: dataframe
+    """
+    _, extension = os.path.splitext(file_path)
+
+    if extension == ".parquet":
+        return read_parquet_as_strings(
+            file_path, columns=columns, dtype_backend=dtype_backend
+        )
+    elif dtype_backend == "pyarrow":
+        return read_csv_as_arrow_strings(file_path)
     else:
-        point = Point(lon, lat)
-
-        geojson_feature_id = None
-
-        for feature in geojson["features"]:
-            id = feature["properties"]["id"]
-            coordinates = feature["geometry"]["coordinates"]
-            polygon = build_polygon(coordinates)
-            if point.within(polygon):
-                geojson_feature_id = id
-
-        # Store result in cache
-        if geojson_feature_id is not None:
-            geojson_feature_cache.loc[geojson_feature_cache_index] = {
-                "geojson_feature_id": geojson_feature_id
-            }
-            geojson_feature_cache.assign(
-                geojson_feature_id=lambda df: df["geojson_feature_id"]
-                .astype(int)
-                .astype(str)
-                .str.zfill(8)
-            )
-            geojson_feature_cache.to_csv(geojson_feature_cache_file_path, index=True)
-            return geojson_feature_id
-        else:
-            return 0
-
-
-def truncate(value, digits):
-    return math.floor(value * 10**digits) / 10**digits
-
-
-def build_polygon(coordinates) -> Polygon:
-    points = [tuple(point) for point in coordinates[0][0]]
-    return Polygon(points)
+        return pd.read_csv(file_path, dtype=str, keep_default_na=False)
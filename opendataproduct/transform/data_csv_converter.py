@@ -1,12 +1,24 @@
+import contextlib
 import os
 import warnings
 
 import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+from pandas.api.types import pandas_dtype
 
 from opendataproduct.config.data_transformation_silver_loader import (
     DataTransformation,
 )
+from opendataproduct.operation_profiler import OperationProfiler
 from opendataproduct.tracking_decorator import TrackingDecorator
+from opendataproduct.transform.data_writer import ParquetOptions, write_data
+from opendataproduct.transform.string_operations import (
+    is_string_column,
+    remove_line_breaks,
+    strip_strings,
+    to_strings,
+)
 
 warnings.simplefilter(action="ignore", category=FutureWarning)
 
@@ -18,175 +30,546 @@ def convert_data_to_csv(
     results_path,
     encoding="utf-8",
     delimiter=",",
+    dtype_backend=None,
+    excel_engine=None,
+    target_formats=None,
+    parquet_options: ParquetOptions = None,
+    profile_file_path=None,
     clean=False,
     quiet=False,
 ):
     already_exists, converted, exception = 0, 0, 0
 
+    # Formats to write, a typed parquet file can be written alongside or instead of the csv file
+    target_formats = target_formats or ["csv"]
+
+    # Records time, rows and memory of each operation if a report is requested
+    profiler = OperationProfiler(
+        "convert_data_to_csv", enabled=profile_file_path is not None
+    )
+
     for input_port in data_transformation.input_ports or []:
         for file in input_port.files or []:
-            for dataset in file.datasets or []:
-                source_file_path = os.path.join(
-                    source_path, input_port.id, file.target_file_name
-                )
-                target_file_path = os.path.join(
-                    results_path, input_port.id, dataset.target_file_name
-                )
-
-                if not clean and os.path.exists(target_file_path):
-                    already_exists += 1
-                    not quiet and print(f"✓ Already exists {dataset.target_file_name}")
-                    continue
+            source_file_path = os.path.join(
+                source_path, input_port.id, file.target_file_name
+            )
 
-                _, source_file_extension = os.path.splitext(source_file_path)
-                engine = "openpyxl" if source_file_extension == ".xlsx" else None
-
-                try:
-                    _, extension = os.path.splitext(source_file_path)
-
-                    if extension in [".xlsx", ".xls"]:
-                        # Read Excel file
-                        dataframe = pd.read_excel(
-                            source_file_path,
-                            engine=engine,
-                            sheet_name=str(dataset.sheet_name),
-                            header=dataset.header,
-                            names=[name.name for name in dataset.names],
-                            usecols=list(
-                                range(
-                                    dataset.skip_cols,
-                                    dataset.skip_cols + len(dataset.names),
-                                )
-                            ),
-                            skiprows=dataset.skip_rows,
-                            keep_default_na=False,
+            # Each workbook is opened once, shared between its datasets and closed after the last one
+            with contextlib.ExitStack() as excel_files:
+                excel_file = None
+
+                for dataset in file.datasets or []:
+                    target_file_path = os.path.join(
+                        results_path, input_port.id, dataset.target_file_name
+                    )
+                    target_file_path_parquet = (
+                        f"{os.path.splitext(target_file_path)[0]}.parquet"
+                    )
+                    target_file_paths = [
+                        file_path
+                        for target_format, file_path in [
+                            ("csv", target_file_path),
+                            ("parquet", target_file_path_parquet),
+                        ]
+                        if target_format in target_formats
+                    ]
+
+                    if not clean and all(
+                        os.path.exists(file_path) for file_path in target_file_paths
+                    ):
+                        already_exists += 1
+                        not quiet and print(
+                            f"✓ Already exists {" / ".join(os.path.basename(file_path) for file_path in target_file_paths)}"
                         )
-                    elif extension == ".csv":
-                        # Read CSV file
-                        dataframe = pd.read_csv(
-                            source_file_path,
-                            header=dataset.header,
-                            names=[name.name for name in dataset.names],
-                            usecols=list(
-                                range(
-                                    dataset.skip_cols,
-                                    dataset.skip_cols + len(dataset.names),
-                                )
+                        continue
+
+                    profiler.start_file(dataset.target_file_name)
+
+                    try:
+                        names = dataset.names
+
+                        # Parameters by column, each operation only touches the columns configured for it
+                        columns = [name.name for name in names if not name.remove]
+                        zfills = {
+                            name.name: name.zfill
+                            for name in names
+                            if not name.remove and name.zfill
+                        }
+                        lstrips = {
+                            name.name: name.lstrip
+                            for name in names
+                            if not name.remove and name.lstrip
+                        }
+                        value_mappings = {
+                            name.name: name.value_mapping
+                            for name in names
+                            if name.value_mapping is not None
+                        }
+                        formats = {
+                            name.name: name.format
+                            for name in names
+                            if name.format in FORMATS
+                        }
+
+                        # Open workbook on first use
+                        if excel_file is None and is_excel_file(source_file_path):
+                            excel_file = excel_files.enter_context(
+                                open_excel_file(source_file_path, excel_engine)
+                            )
+
+                        # Read file
+                        dataframe = profiler.run(
+                            "read",
+                            lambda _: read_dataset(
+                                source_file_path,
+                                dataset,
+                                excel_file=excel_file,
+                                encoding=encoding,
+                                delimiter=delimiter,
+                                dtype_backend=dtype_backend,
                             ),
-                            skiprows=dataset.skip_rows,
-                            keep_default_na=False,
-                            encoding=encoding,
-                            delimiter=delimiter,
-                        )
-                    else:
-                        raise ValueError(
-                            f"✗️ Unsupported file format: {extension}. Only .xlsx, .xls, and .csv are supported."
                         )
 
-                    names = dataset.names
+                        # Apply dropna
+                        if dataset.dropna:
+                            dataframe = profiler.run(
+                                "dropna",
+                                lambda dataframe: dataframe[
+                                    ~(dataframe == "").any(axis=1)
+                                ],
+                                dataframe,
+                            )
 
-                    # Apply dropna
-                    if dataset.dropna:
-                        dataframe = dataframe[~(dataframe == "").any(axis=1)]
+                        # Replace line breaks
+                        dataframe = profiler.run(
+                            "remove_line_breaks", remove_line_breaks, dataframe
+                        )
 
-                    # Replace line breaks
-                    dataframe = dataframe.map(
-                        lambda x: x.replace("\n", "").replace("\r", "")
-                        if isinstance(x, str)
-                        else x
-                    )
+                        # Apply trim
+                        dataframe = profiler.run("trim", strip_strings, dataframe)
 
-                    # Apply trim
-                    dataframe = dataframe.map(
-                        lambda col: col.strip() if isinstance(col, str) else col
-                    )
+                        # Apply data type, all columns are converted to strings below
+                        dataframe = profiler.run(
+                            "type",
+                            lambda dataframe: dataframe.astype(
+                                {
+                                    name.name: name.type
+                                    for name in names
+                                    if not name.remove and name.type != "str"
+                                },
+                                errors="ignore",
+                            ),
+                            dataframe,
+                        )
 
-                    # Apply data type
-                    dataframe = dataframe.astype(
-                        {name.name: name.type for name in names if not name.remove},
-                        errors="ignore",
-                    )
+                        # Apply filter
+                        dataframe = profiler.run(
+                            "filter",
+                            lambda dataframe: dataframe.filter(items=columns),
+                            dataframe,
+                        )
 
-                    # Apply filter
-                    dataframe = dataframe.filter(
-                        items=[name.name for name in names if not name.remove]
-                    )
+                        # Convert all columns to strings
+                        dataframe = profiler.run(
+                            "to_strings",
+                            lambda dataframe: to_strings(dataframe[columns]),
+                            dataframe,
+                        )
 
-                    # Apply zfill
-                    dataframe = (
-                        dataframe[[name.name for name in names if not name.remove]]
-                        .astype(str)
-                        .apply(
-                            lambda col: col.str.zfill(
-                                next(
-                                    name.zfill if name.zfill is not None else 0
-                                    for name in names
-                                    if name.name == col.name
-                                )
-                            )
+                        # Apply zfill
+                        dataframe = profiler.run(
+                            "zfill",
+                            lambda dataframe: apply_to_columns(
+                                dataframe,
+                                zfills,
+                                lambda column, width: column.str.zfill(width),
+                            ),
+                            dataframe,
                         )
-                    )
 
-                    # Apply lstrip
-                    dataframe = (
-                        dataframe[[name.name for name in names if not name.remove]]
-                        .astype(str)
-                        .apply(
-                            lambda col: col.str.lstrip(
-                                next(
-                                    name.lstrip if name.lstrip is not None else ""
-                                    for name in names
-                                    if name.name == col.name
-                                )
-                            )
+                        # Apply lstrip
+                        dataframe = profiler.run(
+                            "lstrip",
+                            lambda dataframe: apply_to_columns(
+                                dataframe,
+                                lstrips,
+                                lambda column, chars: column.str.lstrip(chars),
+                            ),
+                            dataframe,
                         )
-                    )
 
-                    # Apply value mapping
-                    for name in [
-                        name for name in names if name.value_mapping is not None
-                    ]:
-                        dataframe[name.name] = dataframe[name.name].map(
-                            name.value_mapping
+                        # Apply value mapping
+                        dataframe = profiler.run(
+                            "value_mapping",
+                            lambda dataframe: apply_to_columns(
+                                dataframe,
+                                value_mappings,
+                                lambda column, value_mapping: column.map(value_mapping),
+                            ),
+                            dataframe,
                         )
 
-                    # Apply format
-                    for name in [
-                        name for name in names if name.format == "phone_number"
-                    ]:
-                        dataframe[name.name] = dataframe[name.name].apply(
-                            lambda row: build_phone_number(row),
+                        # Apply format
+                        dataframe = profiler.run(
+                            "format",
+                            lambda dataframe: apply_to_columns(
+                                dataframe,
+                                formats,
+                                lambda column, format: FORMATS[format](column),
+                            ),
+                            dataframe,
                         )
-                    for name in [name for name in names if name.format == "coordinate"]:
-                        dataframe[name.name] = dataframe[name.name].apply(
-                            lambda row: row.replace('"', "").replace(",", "."),
+
+                        # Apply head
+                        if dataset.head:
+                            dataframe = profiler.run(
+                                "head",
+                                lambda dataframe: dataframe.head(dataset.head),
+                                dataframe,
+                            )
+
+                        # Apply removal of empty rows
+                        dataframe = profiler.run(
+                            "remove_empty_rows", remove_empty_rows, dataframe
                         )
 
-                    # Apply head
-                    if dataset.head:
-                        dataframe = dataframe.head(dataset.head)
+                        os.makedirs(os.path.dirname(target_file_path), exist_ok=True)
 
-                    # Apply removal of empty rows
-                    dataframe = dataframe.replace("davon", "")
-                    dataframe = dataframe[~(dataframe == "").all(axis=1)]
-                    dataframe = dataframe.dropna(how="all")
+                        if "csv" in target_formats:
+                            profiler.run(
+                                "write",
+                                lambda dataframe: dataframe.to_csv(
+                                    target_file_path, index=False
+                                ),
+                                dataframe,
+                            )
+                        if "parquet" in target_formats:
+                            profiler.run(
+                                "write_parquet",
+                                lambda dataframe: write_data(
+                                    build_typed_dataframe(dataframe, names),
+                                    target_file_path_parquet=target_file_path_parquet,
+                                    parquet_options=parquet_options,
+                                ),
+                                dataframe,
+                            )
 
-                    os.makedirs(os.path.dirname(target_file_path), exist_ok=True)
-                    dataframe.to_csv(target_file_path, index=False)
-                    converted += 1
+                        converted += 1
+                        profiler.finish_file(dataframe)
 
-                    not quiet and print(
-                        f"✓ Convert {os.path.basename(target_file_path)}"
-                    )
-                except Exception as e:
-                    exception += 1
-                    print(f"✗️ Exception: {str(e)}")
+                        not quiet and print(
+                            f"✓ Convert {" / ".join(os.path.basename(file_path) for file_path in target_file_paths)}"
+                        )
+                    except Exception as e:
+                        exception += 1
+                        profiler.finish_file(status="exception")
+                        print(f"✗️ Exception: {str(e)}")
+
+    profiler.write(profile_file_path)
 
     print(
         f"convert_data_to_csv finished with already_exists: {already_exists}, converted: {converted}, exception: {exception}"
     )
 
 
-def build_phone_number(row):
-    phone_number = f"{row.replace(' ', '').replace('/', '').replace('-', '').lstrip('‭').rstrip('‬').lstrip('030').lstrip('(030)').replace('------', '')}"
-    return f"+4930{phone_number}" if len(phone_number) > 0 else ""
+def is_excel_file(file_path) -> bool:
+    _, extension = os.path.splitext(file_path)
+    return extension in [".xlsx", ".xls"]
+
+
+def get_excel_engine(file_path):
+    """
+    Determines the engine to read an Excel file with, openpyxl for xlsx files, pandas' default otherwise
+    :param file_path: file path
+    :return: engine
+    """
+    _, extension = os.path.splitext(file_path)
+    return "openpyxl" if extension == ".xlsx" else None
+
+
+def open_excel_file(file_path, engine=None) -> pd.ExcelFile:
+    """
+    Opens an Excel file once so that all its sheets can be parsed without loading the workbook again
+    :param file_path: file path
+    :param engine: engine, such as calamine if python-calamine is installed, determined by file type if not set
+    :return: Excel file
+    """
+    return pd.ExcelFile(file_path, engine=engine or get_excel_engine(file_path))
+
+
+def read_dataset(
+    source_file_path,
+    dataset,
+    excel_file: pd.ExcelFile = None,
+    encoding="utf-8",
+    delimiter=",",
+    dtype_backend=None,
+) -> pd.DataFrame:
+    """
+    Reads the columns of a dataset. Removed columns are not read unless dropna needs to see all columns first. If
+    types are declared, columns are read as their types and head is applied while reading unless dropna needs to see
+    all rows first. Otherwise types are inferred from all rows and head is applied afterwards
+    :param source_file_path: source file path
+    :param dataset: dataset
+    :param excel_file: opened Excel file
+    :param encoding: encoding of csv file
+    :param delimiter: delimiter of csv file
+    :param dtype_backend: pyarrow to read arrow-backed columns
+    :return: dataframe
+    """
+    _, extension = os.path.splitext(source_file_path)
+
+    usecols, names = build_usecols(dataset)
+    dtype = build_dtypes(dataset, names) if dataset.declare_types else None
+    nrows = dataset.head if dataset.declare_types and not dataset.dropna else None
+
+    if is_excel_file(source_file_path):
+        # Parse sheet of Excel file
+        dataframe = (excel_file or open_excel_file(source_file_path)).parse(
+            sheet_name=str(dataset.sheet_name),
+            header=dataset.header,
+            names=names,
+            usecols=usecols,
+            skiprows=dataset.skip_rows,
+            nrows=nrows,
+            dtype=dtype,
+            keep_default_na=False,
+            **(
+                {"dtype_backend": "pyarrow"}
+                if dtype_backend == "pyarrow" and dtype is None
+                else {}
+            ),
+        )
+
+        # The pyarrow backend infers types before applying declared types, so arrow types are applied afterwards
+        if dtype_backend == "pyarrow" and dtype is not None:
+            dataframe = dataframe.convert_dtypes(dtype_backend="pyarrow")
+        return dataframe
+    elif extension == ".csv" and dtype_backend == "pyarrow":
+        return read_csv_with_pyarrow(
+            source_file_path,
+            dataset,
+            usecols,
+            names,
+            dtype=dtype,
+            nrows=nrows,
+            encoding=encoding,
+            delimiter=delimiter,
+        )
+    elif extension == ".csv":
+        # Read CSV file
+        return pd.read_csv(
+            source_file_path,
+            header=dataset.header,
+            names=names,
+            usecols=usecols,
+            skiprows=dataset.skip_rows,
+            nrows=nrows,
+            dtype=dtype,
+            keep_default_na=False,
+            encoding=encoding,
+            delimiter=delimiter,
+        )
+    else:
+        raise ValueError(
+            f"✗️ Unsupported file format: {extension}. Only .xlsx, .xls, and .csv are supported."
+        )
+
+
+def read_csv_with_pyarrow(
+    source_file_path,
+    dataset,
+    usecols,
+    names,
+    dtype=None,
+    nrows=None,
+    encoding="utf-8",
+    delimiter=",",
+) -> pd.DataFrame:
+    """
+    Reads the columns of a csv file with the pyarrow parser into arrow-backed columns. Columns are selected by their
+    names in the header, and declared types are passed to the parser, because pandas' pyarrow engine only selects
+    columns by name and infers numbers before applying types, which drops leading zeros
+    :param source_file_path: source file path
+    :param dataset: dataset
+    :param usecols: positions of the columns to read
+    :param names: names of the columns to read
+    :param dtype: types by name, inferred if not set
+    :param nrows: number of rows to read, all rows if not set
+    :param encoding: encoding
+    :param delimiter: delimiter
+    :return: dataframe
+    """
+    read_options = pa_csv.ReadOptions(
+        encoding=encoding,
+        # Rows before the header are skipped like pandas does
+        skip_rows=dataset.skip_rows + (dataset.header or 0),
+        autogenerate_column_names=dataset.header is None,
+    )
+    parse_options = pa_csv.ParseOptions(delimiter=delimiter)
+
+    with pa_csv.open_csv(
+        source_file_path, read_options=read_options, parse_options=parse_options
+    ) as reader:
+        header = reader.schema.names
+
+    column_names = [header[index] for index in usecols]
+    convert_options = pa_csv.ConvertOptions(
+        include_columns=column_names,
+        column_types={
+            column_name: get_arrow_type(dtype[name])
+            for column_name, name in zip(column_names, names)
+            if dtype is not None
+        },
+        # Keep empty values like keep_default_na=False
+        null_values=[],
+        strings_can_be_null=False,
+    )
+
+    if nrows is None:
+        table = pa_csv.read_csv(
+            source_file_path,
+            read_options=read_options,
+            parse_options=parse_options,
+            convert_options=convert_options,
+        )
+    else:
+        # Stream blocks until enough rows are read, which only works with declared types since types are otherwise
+        # inferred from the first block
+        with pa_csv.open_csv(
+            source_file_path,
+            read_options=read_options,
+            parse_options=parse_options,
+            convert_options=convert_options,
+        ) as reader:
+            batches, rows = [], 0
+            for batch in reader:
+                batches.append(batch)
+                rows += len(batch)
+                if rows >= nrows:
+                    break
+            table = pa.Table.from_batches(batches, schema=reader.schema).slice(0, nrows)
+
+    dataframe = table.to_pandas(types_mapper=pd.ArrowDtype)
+    dataframe.columns = names
+    return dataframe
+
+
+def build_dtypes(dataset, names) -> dict:
+    """
+    Determines the types to read the columns of a dataset as
+    :param dataset: dataset
+    :param names: names of the columns to read
+    :return: types by name
+    """
+    return {
+        name.name: str if name.type in [None, "str"] else name.type
+        for name in dataset.names
+        if name.name in names
+    }
+
+
+def get_arrow_type(type) -> pa.DataType:
+    if type is str:
+        return pa.string()
+    try:
+        return pa.from_numpy_dtype(pandas_dtype(type))
+    except (TypeError, NotImplementedError, pa.ArrowNotImplementedError):
+        # Types without arrow equivalent are read as strings and converted afterwards
+        return pa.string()
+
+
+def build_usecols(dataset) -> tuple[list[int], list[str]]:
+    """
+    Determines positions and names of the columns to read
+    :param dataset: dataset
+    :return: column positions and names
+    """
+    columns = [
+        (index, name.name)
+        for index, name in enumerate(dataset.names, start=dataset.skip_cols)
+        # dropna considers removed columns as well
+        if dataset.dropna or not name.remove
+    ]
+
+    return [index for index, _ in columns], [name for _, name in columns]
+
+
+def apply_to_columns(
+    dataframe: pd.DataFrame, parameters: dict, operation
+) -> pd.DataFrame:
+    """
+    Applies an operation to the columns it is configured for
+    :param dataframe: dataframe
+    :param parameters: parameters of the operation by column name
+    :param operation: function that takes a column and its parameter and returns a column
+    :return: dataframe
+    """
+    if not parameters:
+        return dataframe
+
+    return dataframe.assign(
+        **{
+            column_name: operation(dataframe[column_name], parameter)
+            for column_name, parameter in parameters.items()
+        }
+    )
+
+
+def build_typed_dataframe(dataframe: pd.DataFrame, names) -> pd.DataFrame:
+    """
+    Converts string columns back to their declared types for typed file formats. Columns stay strings if their values
+    cannot be reproduced from the declared type, e.g. because of empty values or leading zeros
+    :param dataframe: dataframe
+    :param names: names
+    :return: dataframe
+    """
+    columns = {}
+
+    for column_name, column in dataframe.items():
+        type = next((name.type for name in names if name.name == column_name), None)
+
+        if type not in [None, "str"]:
+            try:
+                typed_column = column.astype(type)
+                if (typed_column.astype(str) == column.astype(str)).all():
+                    columns[column_name] = typed_column
+                    continue
+            except (TypeError, ValueError):
+                pass
+
+        # Mapped values may mix strings, numbers and missing values
+        if not is_string_column(column):
+            columns[column_name] = column.astype(pd.StringDtype())
+
+    return dataframe.assign(**columns) if columns else dataframe
+
+
+def remove_empty_rows(dataframe: pd.DataFrame) -> pd.DataFrame:
+    dataframe = dataframe.replace("davon", "")
+    dataframe = dataframe[~(dataframe == "").all(axis=1)]
+    return dataframe.dropna(how="all")
+
+
+def build_phone_numbers(column: pd.Series) -> pd.Series:
+    """
+    Formats phone numbers as +4930 followed by the local number without separators, leading zeros or area code
+    :param column: column
+    :return: formatted column
+    """
+    phone_numbers = (
+        column.str.replace(r"[ /-]", "", regex=True)
+        .str.replace("^\u202d*[()03]*", "", regex=True)
+        .str.replace("\u202c+$", "", regex=True)
+    )
+    return ("+4930" + phone_numbers).where(phone_numbers.str.len() > 0, "")
+
+
+def build_coordinates(column: pd.Series) -> pd.Series:
+    return column.str.replace('"', "", regex=False).str.replace(",", ".", regex=False)
+
+
+FORMATS = {
+    "phone_number": build_phone_numbers,
+    "coordinate": build_coordinates,
+}
@@ -0,0 +1,110 @@
+import json
+import os
+from typing import Optional
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+
+def get_silver_parquet_file_path(file_path) -> Optional[str]:
+    """
+    Finds the typed parquet file written next to a silver csv file. It is only used if it is at least as new as the
+    csv file, otherwise the csv file has been rewritten since and the parquet file is stale
+    :param file_path: file path of csv file
+    :return: file path of parquet file, None if there is no parquet file or it is older than the csv file
+    """
+    file_path_parquet = f"{os.path.splitext(file_path)[0]}.parquet"
+
+    if os.path.exists(file_path_parquet) and (
+        not os.path.exists(file_path)
+        or os.path.getmtime(file_path_parquet) >= os.path.getmtime(file_path)
+    ):
+        return file_path_parquet
+    return None
+
+
+def read_gold(path, columns=None, filters=None) -> pd.DataFrame:
+    """
+    Reads a gold parquet file or hive-partitioned parquet dataset. Only partitions and row groups whose values can
+    match the filters are read
+    :param path: path of parquet file or dataset directory
+    :param columns: names of columns to read, all columns if not set
+    :param filters: pyarrow expression or list of (column, operator, value) tuples, such as [("district", "=", "01")]
+    :return: dataframe
+    """
+    return (
+        open_gold_dataset(path)
+        .to_table(
+            columns=columns,
+            filter=(
+                pq.filters_to_expression(filters)
+                if filters is not None and not isinstance(filters, ds.Expression)
+                else filters
+            ),
+        )
+        .to_pandas()
+    )
+
+
+def open_gold_dataset(path) -> ds.Dataset:
+    """
+    Opens a gold parquet file or hive-partitioned parquet dataset, partition columns get the types they were written
+    with rather than types inferred from directory names, which would drop leading zeros
+    :param path: path of parquet file or dataset directory
+    :return: dataset
+    """
+    common_metadata_path = os.path.join(path, "_common_metadata")
+
+    if not os.path.isdir(path) or not os.path.exists(common_metadata_path):
+        return ds.dataset(path, format="parquet", partitioning="hive")
+
+    schema = pq.read_schema(common_metadata_path)
+    partition_names = get_partition_names(path)
+
+    return ds.dataset(
+        path,
+        format="parquet",
+        schema=schema,
+        partitioning=ds.partitioning(
+            pa.schema([schema.field(name) for name in partition_names]),
+            flavor="hive",
+        ),
+    )
+
+
+def get_partition_names(path):
+    """
+    Reads the names of partition columns from the nested directory names of a dataset, such as district=01/year=2024
+    :param path: path of dataset directory
+    :return: names of partition columns
+    """
+    names = []
+
+    while True:
+        directories = sorted(
+            entry.name
+            for entry in os.scandir(path)
+            if entry.is_dir() and "=" in entry.name
+        )
+        if not directories:
+            return names
+
+        names.append(directories[0].split("=", 1)[0])
+        path = os.path.join(path, directories[0])
+
+
+def read_gold_periods(path) -> list:
+    """
+    Reads the index of periods of a cumulative dataset
+    :param path: path of dataset directory
+    :return: periods with their values, partition path, number of rows and update time, ordered by period
+    """
+    index_file_path = os.path.join(path, "_periods.json")
+
+    if not os.path.exists(index_file_path):
+        return []
+
+    with open(index_file_path, "r", encoding="utf-8") as index_file:
+        return json.load(index_file)["periods"]
@@ -0,0 +1,135 @@
+import os
+
+import duckdb
+
+from opendataproduct.config.data_transformation_sql_loader import (
+    DataTransformation,
+    Table,
+)
+from opendataproduct.tracking_decorator import TrackingDecorator
+from opendataproduct.transform.data_reader import get_silver_parquet_file_path
+from opendataproduct.transform.data_writer import ParquetOptions, write_data
+
+
+@TrackingDecorator.track_time
+def transform_data_with_sql(
+    data_transformation: DataTransformation,
+    source_path,
+    results_path,
+    memory_limit=None,
+    threads=None,
+    temp_directory=None,
+    csv_engine=None,
+    parquet_options: ParquetOptions = None,
+    clean=False,
+    quiet=False,
+):
+    already_exists, converted, exception = 0, 0, 0
+
+    # Memory limit, threads and spill directory of the in-process database, DuckDB's defaults if not set
+    config = {
+        key: value
+        for key, value in {
+            "memory_limit": memory_limit,
+            "threads": threads,
+            "temp_directory": temp_directory,
+        }.items()
+        if value is not None
+    }
+
+    with duckdb.connect(config=config) as connection:
+        for input_port in data_transformation.input_ports or []:
+            for file in input_port.files or []:
+                file_name, _ = os.path.splitext(file.target_file_name)
+                target_file_path_csv = os.path.join(
+                    results_path,
+                    f"{input_port.id.replace("-csv", "")}-csv",
+                    f"{file_name}.csv",
+                )
+                target_file_path_parquet = os.path.join(
+                    results_path,
+                    f"{input_port.id.replace("-csv", "")}-parquet",
+                    f"{file_name}.parquet",
+                )
+
+                if (
+                    not clean
+                    and os.path.exists(target_file_path_csv)
+                    and os.path.exists(target_file_path_parquet)
+                ):
+                    already_exists += 1
+                    not quiet and print(
+                        f"✓ Already exists {os.path.basename(target_file_path_csv)} / {os.path.basename(target_file_path_parquet)}"
+                    )
+                    continue
+
+                try:
+                    for table in file.tables or []:
+                        register_table(
+                            connection,
+                            table,
+                            os.path.join(
+                                source_path,
+                                table.input_port_id or input_port.id,
+                                table.source_file_name,
+                            ),
+                        )
+
+                    dataframe = connection.sql(file.query).df()
+
+                    write_data(
+                        dataframe,
+                        target_file_path_csv,
+                        target_file_path_parquet,
+                        csv_engine=csv_engine,
+                        parquet_options=parquet_options,
+                    )
+
+                    converted += 1
+                    not quiet and print(
+                        f"✓ Convert {os.path.basename(target_file_path_csv)} / {os.path.basename(target_file_path_parquet)}"
+                    )
+                except Exception as e:
+                    exception += 1
+                    print(f"✗️ Exception: {str(e)}")
+                finally:
+                    # Views of one file must not be visible to the queries of other files
+                    for table in file.tables or []:
+                        drop_table(connection, table)
+
+    print(
+        f"transform_data_with_sql finished with already_exists: {already_exists}, converted: {converted}, exception: {exception}"
+    )
+
+
+def register_table(connection: duckdb.DuckDBPyConnection, table: Table, file_path):
+    """
+    Registers a silver file as view that queries can refer to by the name of the table. A typed parquet file written
+    next to the csv file is preferred unless the csv file is newer
+    :param connection: connection
+    :param table: table
+    :param file_path: file path of csv file
+    :return:
+    """
+    file_path_parquet = get_silver_parquet_file_path(file_path)
+
+    if file_path_parquet is not None:
+        relation = connection.read_parquet(file_path_parquet)
+    else:
+        # Read values as strings like the gold transformation, so that ids keep their leading zeros
+        relation = connection.read_csv(
+            file_path, header=True, all_varchar=True, na_values=[]
+        )
+
+    relation.create_view(table.name, replace=True)
+
+
+def drop_table(connection: duckdb.DuckDBPyConnection, table: Table):
+    """
+    Drops the view of a table if it has been registered
+    :param connection: connection
+    :param table: table
+    :return:
+    """
+    name = table.name.replace('"', '""')
+    connection.execute(f'DROP VIEW IF EXISTS "{name}"')
@@ -0,0 +1,230 @@
+import json
+import os
+import shutil
+from dataclasses import dataclass
+from datetime import datetime
+from typing import List, Optional
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+
+@dataclass
+class ParquetOptions:
+    compression: Optional[str] = "zstd"
+    compression_level: Optional[int] = None
+    row_group_size: Optional[int] = None
+    # Columns to dictionary-encode, by default id columns and string columns
+    dictionary_columns: Optional[List[str]] = None
+    write_statistics: bool = True
+
+
+def write_data(
+    dataframe: pd.DataFrame,
+    target_file_path_csv=None,
+    target_file_path_parquet=None,
+    csv_engine=None,
+    parquet_options: ParquetOptions = None,
+    partition_by=None,
+) -> pa.Table:
+    """
+    Writes a dataframe as csv and parquet file from a single arrow table
+    :param dataframe: dataframe
+    :param target_file_path_csv: target file path of csv file
+    :param target_file_path_parquet: target file path of parquet file, or of dataset directory if partitioned
+    :param csv_engine: pyarrow to write csv with pyarrow's writer, pandas otherwise
+    :param parquet_options: parquet options
+    :param partition_by: columns to write a hive-partitioned parquet dataset by
+    :return: arrow table
+    """
+    table = pa.Table.from_pandas(dataframe, preserve_index=False)
+
+    if target_file_path_csv is not None:
+        os.makedirs(os.path.dirname(target_file_path_csv), exist_ok=True)
+
+        if csv_engine == "pyarrow":
+            # Opt-in since pyarrow quotes all strings and writes whole floats without decimals
+            pa_csv.write_csv(
+                table,
+                target_file_path_csv,
+                write_options=pa_csv.WriteOptions(quoting_style="needed"),
+            )
+        else:
+            dataframe.to_csv(target_file_path_csv, index=False)
+
+    if target_file_path_parquet is not None and partition_by:
+        # Replace the whole dataset, so that no partitions of previous runs remain
+        shutil.rmtree(target_file_path_parquet, ignore_errors=True)
+        write_parquet_dataset(
+            table, target_file_path_parquet, partition_by, parquet_options
+        )
+    elif target_file_path_parquet is not None:
+        os.makedirs(os.path.dirname(target_file_path_parquet), exist_ok=True)
+        write_parquet(table, target_file_path_parquet, parquet_options)
+
+    return table
+
+
+def write_parquet(table: pa.Table, file_path, parquet_options: ParquetOptions = None):
+    parquet_options = parquet_options or ParquetOptions()
+
+    pq.write_table(
+        table,
+        file_path,
+        compression=parquet_options.compression,
+        compression_level=parquet_options.compression_level,
+        row_group_size=parquet_options.row_group_size,
+        use_dictionary=get_dictionary_columns(table, parquet_options),
+        write_statistics=parquet_options.write_statistics,
+    )
+
+
+def write_parquet_dataset(
+    table: pa.Table,
+    path,
+    partition_by,
+    parquet_options: ParquetOptions = None,
+    existing_data_behavior="delete_matching",
+):
+    """
+    Writes a table as hive-partitioned parquet dataset with one directory per partition, such as district=01/. The
+    schema including the partition columns is kept in a _common_metadata file, so that readers restore their types
+    :param table: table
+    :param path: path of dataset directory
+    :param partition_by: name or names of columns to partition by
+    :param parquet_options: parquet options
+    :param existing_data_behavior: delete_matching to replace partitions that are written, overwrite_or_ignore to
+    add files to them
+    :return:
+    """
+    parquet_options = parquet_options or ParquetOptions()
+    partition_by = [partition_by] if isinstance(partition_by, str) else partition_by
+
+    # Partition values are written as directory names, so that dictionary-encoded columns are decoded first
+    for name in partition_by:
+        index = table.schema.get_field_index(name)
+        if index < 0:
+            raise ValueError(f"Partition column {name} does not exist")
+        if pa.types.is_dictionary(table.schema.field(index).type):
+            table = table.set_column(
+                index,
+                name,
+                table.column(index).cast(table.schema.field(index).type.value_type),
+            )
+
+    file_format = ds.ParquetFileFormat()
+    ds.write_dataset(
+        table,
+        path,
+        format=file_format,
+        partitioning=ds.partitioning(table.select(partition_by).schema, flavor="hive"),
+        file_options=file_format.make_write_options(
+            compression=parquet_options.compression,
+            compression_level=parquet_options.compression_level,
+            use_dictionary=get_dictionary_columns(table, parquet_options),
+            write_statistics=parquet_options.write_statistics,
+        ),
+        basename_template="part-{i}.parquet",
+        existing_data_behavior=existing_data_behavior,
+        **(
+            {"max_rows_per_group": parquet_options.row_group_size}
+            if parquet_options.row_group_size is not None
+            else {}
+        ),
+    )
+
+    pq.write_metadata(table.schema, os.path.join(path, "_common_metadata"))
+
+
+def append_parquet_partition(
+    table: pa.Table, path, period: dict, parquet_options: ParquetOptions = None
+):
+    """
+    Appends a table as partition of one period to a cumulative hive-partitioned dataset, such as
+    year=2024/month=01/. Partitions of other periods are not touched, the partition of the same period is replaced
+    :param table: table
+    :param path: path of dataset directory
+    :param period: values of the period columns, such as {"year": 2024, "month": "01"}
+    :param parquet_options: parquet options
+    :return:
+    """
+    period = {name: str(value) for name, value in period.items()}
+
+    for name, value in period.items():
+        if name in table.column_names:
+            raise ValueError(f"Period column {name} already exists")
+        table = table.append_column(
+            name, pa.array([value] * table.num_rows, type=pa.string())
+        )
+
+    # Partitions of all periods are read as one dataset, so that they need to share a schema
+    common_metadata_path = os.path.join(path, "_common_metadata")
+    if os.path.exists(common_metadata_path) and not pq.read_schema(
+        common_metadata_path
+    ).remove_metadata().equals(table.schema.remove_metadata()):
+        raise ValueError(f"Schema differs from cumulative dataset {path}")
+
+    write_parquet_dataset(table, path, list(period), parquet_options)
+    update_period_index(path, period, table.num_rows)
+
+
+def update_period_index(path, period: dict, rows):
+    """
+    Adds a period to the index of a cumulative dataset, which lists its periods without scanning its partitions
+    :param path: path of dataset directory
+    :param period: values of the period columns
+    :param rows: number of rows of the period
+    :return:
+    """
+    index_file_path = os.path.join(path, "_periods.json")
+
+    periods = []
+    if os.path.exists(index_file_path):
+        with open(index_file_path, "r", encoding="utf-8") as index_file:
+            periods = json.load(index_file)["periods"]
+
+    periods = sorted(
+        [entry for entry in periods if entry["period"] != period]
+        + [
+            {
+                "period": period,
+                "path": build_partition_path(period),
+                "rows": rows,
+                "updated": datetime.now().isoformat(timespec="seconds"),
+            }
+        ],
+        key=lambda entry: list(entry["period"].values()),
+    )
+
+    # Replace the index at once, so that readers never see a partially written file
+    with open(f"{index_file_path}.tmp", "w", encoding="utf-8") as index_file:
+        json.dump(
+            {"partition_by": list(period), "periods": periods}, index_file, indent=2
+        )
+    os.replace(f"{index_file_path}.tmp", index_file_path)
+
+
+def build_partition_path(period: dict) -> str:
+    return "/".join(f"{name}={value}" for name, value in period.items())
+
+
+def get_dictionary_columns(table: pa.Table, parquet_options: ParquetOptions):
+    dictionary_columns = (
+        parquet_options.dictionary_columns
+        if parquet_options.dictionary_columns is not None
+        else [
+            field.name
+            for field in table.schema
+            if is_id_column(field.name)
+            or pa.types.is_string(field.type)
+            or pa.types.is_large_string(field.type)
+        ]
+    )
+    return [name for name in dictionary_columns if name in table.column_names]
+
+
+def is_id_column(name) -> bool:
+    return name == "id" or name.endswith("_id") or name.endswith("-id")
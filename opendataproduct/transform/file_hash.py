@@ -0,0 +1,14 @@
+import hashlib
+
+
+def build_file_hash(file_path):
+    """
+    Builds the sha256 hash of the content of a file, read in chunks so that large files are not loaded at once
+    :param file_path: file path
+    :return: hex digest of hash
+    """
+    hash = hashlib.sha256()
+    with open(file_path, "rb") as file:
+        for chunk in iter(lambda: file.read(1024 * 1024), b""):
+            hash.update(chunk)
+    return hash.hexdigest()
@@ -0,0 +1,104 @@
+import numpy as np
+import pandas as pd
+from pandas.api.types import is_numeric_dtype
+
+from opendataproduct.config.data_transformation_gold_loader import Filter
+
+FILTER_OPERATIONS = [
+    "equals",
+    "does_not_equal",
+    "starts_with",
+    "does_not_start_with",
+    "ends_with",
+    "does_not_end_with",
+    "in",
+    "not_in",
+    "matches",
+    "does_not_match",
+    "between",
+    "greater_than",
+    "greater_than_or_equal",
+    "less_than",
+    "less_than_or_equal",
+    "is_null",
+    "is_not_null",
+]
+
+
+def build_filter_mask(dataframe: pd.DataFrame, filters: list[Filter]) -> np.ndarray:
+    """
+    Evaluates filters into one combined boolean mask of rows to keep
+    :param dataframe: dataframe
+    :param filters: filters
+    :return: boolean mask
+    """
+    mask = np.ones(len(dataframe), dtype=bool)
+
+    for filter in filters:
+        mask &= evaluate_filter(dataframe[filter.key], filter)
+
+    return mask
+
+
+def evaluate_filter(column: pd.Series, filter: Filter) -> np.ndarray:
+    operation = filter.operation
+
+    if operation in ["equals", "does_not_equal"]:
+        result = column == normalize_value(column, filter.value)
+    elif operation in ["starts_with", "does_not_start_with"]:
+        result = column.str.startswith(filter.value)
+    elif operation in ["ends_with", "does_not_end_with"]:
+        result = column.str.endswith(filter.value)
+    elif operation in ["in", "not_in"]:
+        # A single value may be given instead of a list
+        values = (
+            filter.value
+            if isinstance(filter.value, list)
+            else [filter.value] if filter.value is not None else []
+        )
+        result = column.isin({normalize_value(column, value) for value in values})
+    elif operation in ["matches", "does_not_match"]:
+        result = column.str.contains(filter.value, regex=True)
+    elif operation == "between":
+        values = pd.to_numeric(column, errors="coerce")
+        result = pd.Series(True, index=column.index)
+        if filter.min is not None:
+            result &= values >= filter.min
+        if filter.max is not None:
+            result &= values <= filter.max
+    elif operation == "greater_than":
+        result = pd.to_numeric(column, errors="coerce") > float(filter.value)
+    elif operation == "greater_than_or_equal":
+        result = pd.to_numeric(column, errors="coerce") >= float(filter.value)
+    elif operation == "less_than":
+        result = pd.to_numeric(column, errors="coerce") < float(filter.value)
+    elif operation == "less_than_or_equal":
+        result = pd.to_numeric(column, errors="coerce") <= float(filter.value)
+    elif operation in ["is_null", "is_not_null"]:
+        result = column.isna() | (column == "")
+    else:
+        raise ValueError(
+            f"✗️ Unsupported filter operation: {operation}. Supported are {", ".join(FILTER_OPERATIONS)}."
+        )
+
+    # Treat missing results as not matching
+    result = pd.Series(result, index=column.index, dtype="boolean").fillna(False)
+    result = result.to_numpy(dtype=bool)
+
+    return (
+        ~result
+        if operation.startswith("does_not_") or operation in ["not_in", "is_not_null"]
+        else result
+    )
+
+
+def normalize_value(column: pd.Series, value):
+    """
+    Converts a configured value into the type of the column it is compared with
+    :param column: column
+    :param value: value
+    :return: normalized value
+    """
+    if is_numeric_dtype(column.dtype):
+        return pd.to_numeric(value)
+    return str(value)
@@ -0,0 +1,113 @@
+import os
+
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+import shapely
+
+from opendataproduct.transform.data_writer import ParquetOptions
+
+GEODATA_FORMATS = ["geojson", "geoparquet"]
+
+
+def load_geojson_template(file_path) -> gpd.GeoDataFrame:
+    """
+    Loads the ids and geometries of the features of a geojson template
+    :param file_path: file path of geojson template
+    :return: geodataframe with id and geometry columns
+    """
+    template = gpd.read_file(file_path, columns=["id"])
+    template["id"] = template["id"].astype(str)
+    return template[["id", "geometry"]]
+
+
+def join_template_features(
+    template: gpd.GeoDataFrame, dataframe: pd.DataFrame, min_match_share=0.5
+) -> gpd.GeoDataFrame:
+    """
+    Joins the rows of a gold dataframe to the features of a geojson template by id. All template features are kept,
+    features without matching row get empty values. Rows without matching feature are dropped, which usually means
+    that the ids of the data and the template are formatted differently
+    :param template: geodataframe with id and geometry columns
+    :param dataframe: dataframe with id column
+    :param min_match_share: share of rows that need to match a feature without printing a warning
+    :return: geodataframe
+    """
+    if "id" not in dataframe.columns:
+        raise ValueError("Column id required to join geojson template does not exist")
+
+    # Ids of template features are strings, so numeric ids are compared by their string representation
+    values = dataframe.assign(id=dataframe["id"].astype(str).astype(object))
+
+    matches = values["id"].isin(template["id"]).sum()
+    if len(values) > 0 and matches == 0:
+        raise ValueError(
+            f"✗️ None of {len(values)} rows match a feature of the geojson template by id"
+        )
+    if matches < min_match_share * len(values):
+        print(
+            f"✗️ Only {matches} of {len(values)} rows match a feature of the geojson template by id"
+        )
+
+    # Integer columns become nullable so that features without matching row do not turn counts into floats
+    values = values.astype(
+        {
+            name: "Int64"
+            for name, dtype in values.dtypes.items()
+            if isinstance(dtype, np.dtype) and dtype.kind in "iu"
+        }
+    )
+
+    return gpd.GeoDataFrame(
+        template.merge(values, on="id", how="left", validate="one_to_many"),
+        geometry="geometry",
+        crs=template.crs,
+    )
+
+
+def write_geodata(
+    geodataframe: gpd.GeoDataFrame,
+    target_file_path_geojson=None,
+    target_file_path_geoparquet=None,
+    coordinate_precision=6,
+    parquet_options: ParquetOptions = None,
+):
+    """
+    Writes a geodataframe as geojson and geoparquet file with coordinates rounded to a number of decimals
+    :param geodataframe: geodataframe
+    :param target_file_path_geojson: file path of geojson file, not written if not set
+    :param target_file_path_geoparquet: file path of geoparquet file, not written if not set
+    :param coordinate_precision: number of decimals of coordinates, 6 decimals are about 0.1 m
+    :param parquet_options: parquet options
+    :return:
+    """
+    if parquet_options is None:
+        parquet_options = ParquetOptions()
+
+    # Round coordinates without repairing topology, as a template is expected to be valid already
+    geodataframe = geodataframe.set_geometry(
+        shapely.set_precision(
+            geodataframe.geometry.values,
+            grid_size=10**-coordinate_precision,
+            mode="pointwise",
+        )
+    )
+
+    if target_file_path_geojson is not None:
+        os.makedirs(os.path.dirname(target_file_path_geojson), exist_ok=True)
+        geodataframe.to_file(
+            target_file_path_geojson,
+            driver="GeoJSON",
+            engine="pyogrio",
+            COORDINATE_PRECISION=coordinate_precision,
+        )
+
+    if target_file_path_geoparquet is not None:
+        os.makedirs(os.path.dirname(target_file_path_geoparquet), exist_ok=True)
+        geodataframe.to_parquet(
+            target_file_path_geoparquet,
+            index=False,
+            compression=parquet_options.compression,
+            compression_level=parquet_options.compression_level,
+            row_group_size=parquet_options.row_group_size,
+        )
@@ -0,0 +1,97 @@
+import os
+import sqlite3
+from contextlib import contextmanager
+
+
+class GeojsonFeatureCache(object):
+    """
+    Caches geojson feature ids by template and truncated coordinate. Entries are kept in memory during a run and
+    persisted in a sqlite database that can be shared by parallel processes
+    """
+
+    def __init__(self, cache_file_path, timeout=60):
+        self.cache_file_path = cache_file_path
+        self.timeout = timeout
+
+        # Entries by template hash, loaded lazily from the database
+        self.entries = {}
+        # Entries that have not been written to the database yet
+        self.pending = {}
+
+    def get_many(self, template_hash, keys) -> dict:
+        """
+        Gets cached feature ids
+        :param template_hash: hash of the geojson template
+        :param keys: coordinate keys
+        :return: feature ids by key for all keys that are cached
+        """
+        entries = self.load(template_hash)
+        return {key: entries[key] for key in keys if key in entries}
+
+    def put_many(self, template_hash, feature_ids: dict):
+        """
+        Puts feature ids into the cache, they are persisted on flush
+        :param template_hash: hash of the geojson template
+        :param feature_ids: feature ids by coordinate key
+        :return:
+        """
+        self.load(template_hash).update(feature_ids)
+        self.pending.setdefault(template_hash, {}).update(feature_ids)
+
+    def load(self, template_hash) -> dict:
+        if template_hash not in self.entries:
+            self.entries[template_hash] = {}
+
+            if os.path.exists(self.cache_file_path):
+                with self.connect() as connection:
+                    self.entries[template_hash] = {
+                        (lat, lon): feature_id
+                        for lat, lon, feature_id in connection.execute(
+                            "SELECT lat, lon, feature_id FROM geojson_feature_cache WHERE template_hash = ?",
+                            (template_hash,),
+                        )
+                    }
+
+        return self.entries[template_hash]
+
+    def flush(self):
+        """
+        Writes pending entries to the database in a single transaction
+        :return:
+        """
+        if not any(self.pending.values()):
+            return
+
+        os.makedirs(os.path.dirname(self.cache_file_path) or ".", exist_ok=True)
+
+        with self.connect() as connection:
+            # Entries are deterministic for a template, so concurrent writers may safely ignore existing rows
+            connection.executemany(
+                "INSERT OR IGNORE INTO geojson_feature_cache (template_hash, lat, lon, feature_id) VALUES (?, ?, ?, ?)",
+                [
+                    (template_hash, lat, lon, str(feature_id))
+                    for template_hash, feature_ids in self.pending.items()
+                    for (lat, lon), feature_id in feature_ids.items()
+                ],
+            )
+
+        self.pending = {}
+
+    @contextmanager
+    def connect(self):
+        connection = sqlite3.connect(self.cache_file_path, timeout=self.timeout)
+        try:
+            # Let readers and a writer of parallel runs access the database at the same time
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS geojson_feature_cache ("
+                "template_hash TEXT NOT NULL, "
+                "lat INTEGER NOT NULL, "
+                "lon INTEGER NOT NULL, "
+                "feature_id TEXT NOT NULL, "
+                "PRIMARY KEY (template_hash, lat, lon))"
+            )
+            with connection:
+                yield connection
+        finally:
+            connection.close()
@@ -0,0 +1,125 @@
+import json
+
+import numpy as np
+import pandas as pd
+import shapely
+from shapely.geometry import shape
+
+from opendataproduct.transform.file_hash import build_file_hash
+from opendataproduct.transform.geojson_feature_cache import GeojsonFeatureCache
+
+
+class GeojsonFeatureIndex(object):
+    """
+    Spatial index over the features of a geojson template that assigns feature ids to points in batches
+    """
+
+    def __init__(self, ids, geometries, template_hash=None):
+        self.ids = np.asarray(ids, dtype=object)
+        self.geometries = np.asarray(geometries, dtype=object)
+        self.template_hash = template_hash
+
+        # Prepare geometries so that repeated containment checks are cheap
+        shapely.prepare(self.geometries)
+        self.tree = shapely.STRtree(self.geometries)
+
+    @classmethod
+    def from_geojson(cls, geojson, template_hash=None):
+        features = [
+            feature
+            for feature in geojson["features"]
+            if feature.get("geometry") is not None
+        ]
+        return cls(
+            ids=[feature["properties"]["id"] for feature in features],
+            geometries=[shape(feature["geometry"]) for feature in features],
+            template_hash=template_hash,
+        )
+
+    @classmethod
+    def from_file(cls, geojson_template_file_path):
+        return cls.from_geojson(
+            load_geojson_file(geojson_template_file_path),
+            template_hash=build_file_hash(geojson_template_file_path),
+        )
+
+    def lookup(
+        self, lat_values, lon_values, default=0, cache: GeojsonFeatureCache = None
+    ) -> np.ndarray:
+        """
+        Looks up the id of the feature containing each point
+        :param lat_values: latitudes
+        :param lon_values: longitudes
+        :param default: value for points that are not contained in any feature
+        :param cache: cache of feature ids by truncated coordinate
+        :return: array of feature ids
+        """
+        lat = truncate(pd.to_numeric(lat_values, errors="coerce"), 4)
+        lon = truncate(pd.to_numeric(lon_values, errors="coerce"), 4)
+
+        if cache is None or self.template_hash is None:
+            return self.query(lat, lon, default)
+
+        # Look up each distinct coordinate only once
+        valid = ~(np.isnan(lat) | np.isnan(lon))
+        keys = np.stack(
+            [
+                np.round(lat[valid] * 10**4).astype(np.int64),
+                np.round(lon[valid] * 10**4).astype(np.int64),
+            ],
+            axis=1,
+        )
+        unique_keys, inverse = np.unique(keys, axis=0, return_inverse=True)
+        unique_keys = [tuple(key) for key in unique_keys.tolist()]
+
+        cached = cache.get_many(self.template_hash, unique_keys)
+        missing = [key for key in unique_keys if key not in cached]
+
+        if len(missing) > 0:
+            missing_keys = np.array(missing, dtype=float) / 10**4
+            missing_feature_ids = self.query(
+                missing_keys[:, 0], missing_keys[:, 1], default
+            )
+            computed = dict(zip(missing, missing_feature_ids.tolist()))
+            cache.put_many(self.template_hash, computed)
+            cached |= computed
+
+        feature_ids = np.full(len(lat), default, dtype=object)
+        feature_ids[valid] = np.array(
+            [cached[key] for key in unique_keys], dtype=object
+        )[inverse.reshape(-1)]
+        return feature_ids
+
+    def query(self, lat, lon, default=0) -> np.ndarray:
+        feature_ids = np.full(len(lat), default, dtype=object)
+
+        if len(lat) == 0 or len(self.ids) == 0:
+            return feature_ids
+
+        # Identify candidate features by their bounding boxes
+        input_index, tree_index = self.tree.query(shapely.points(lon, lat))
+
+        # Keep candidates that actually contain the point
+        contained = shapely.contains_xy(
+            self.geometries[tree_index], lon[input_index], lat[input_index]
+        )
+        input_index, tree_index = input_index[contained], tree_index[contained]
+
+        # Let the last matching feature win if features overlap
+        order = np.lexsort((tree_index, input_index))
+        input_index, tree_index = input_index[order], tree_index[order]
+        last = np.append(input_index[1:] != input_index[:-1], True)
+
+        feature_ids[input_index[last]] = self.ids[tree_index[last]]
+        return feature_ids
+
+
+def load_geojson_file(geojson_template_file_path):
+    with open(
+        file=geojson_template_file_path, mode="r", encoding="utf-8"
+    ) as geojson_file:
+        return json.load(geojson_file, strict=False)
+
+
+def truncate(values, digits):
+    return np.floor(np.asarray(values, dtype=float) * 10**digits) / 10**digits
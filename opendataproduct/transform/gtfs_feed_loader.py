@@ -0,0 +1,181 @@
+import hashlib
+import json
+import os
+import zipfile
+
+import pandas as pd
+from opendataproduct.transform.file_hash import build_file_hash
+
+# Columns read per GTFS table with compact dtypes, optional columns are skipped if a feed does not have them
+gtfs_columns = {
+    "routes": {
+        "route_id": "category",
+        "route_short_name": "str",
+        "route_type": "int16",
+        "route_color": "str",
+    },
+    "trips": {
+        "route_id": "category",
+        "trip_id": "category",
+        "service_id": "category",
+        "shape_id": "category",
+    },
+    "stops": {
+        "stop_id": "category",
+        "stop_name": "str",
+        "stop_lat": "float64",
+        "stop_lon": "float64",
+    },
+    "stop_times": {
+        "trip_id": "category",
+        "stop_id": "category",
+    },
+    "shapes": {
+        "shape_id": "category",
+        "shape_pt_lat": "float64",
+        "shape_pt_lon": "float64",
+        "shape_pt_sequence": "int32",
+    },
+    "calendar": {
+        "service_id": "category",
+        "monday": "int8",
+        "tuesday": "int8",
+        "wednesday": "int8",
+        "thursday": "int8",
+        "friday": "int8",
+        "saturday": "int8",
+        "sunday": "int8",
+        "start_date": "str",
+        "end_date": "str",
+    },
+    "calendar_dates": {
+        "service_id": "category",
+        "date": "str",
+        "exception_type": "int8",
+    },
+}
+
+
+def load_gtfs_tables(feed_file_path, tables=None, cache_path=None) -> dict:
+    """
+    Loads the columns of GTFS tables that are required for conversion with compact dtypes
+    :param feed_file_path: GTFS feed zip file
+    :param tables: names of tables to load, all tables in gtfs_columns if not set
+    :param cache_path: directory in which parsed tables are cached as parquet keyed by the hash of the feed
+    :return: dataframe by table name, empty if the feed does not contain a table
+    """
+    tables = tables or list(gtfs_columns.keys())
+
+    feed_cache_path = (
+        os.path.join(cache_path, build_file_hash(feed_file_path))
+        if cache_path is not None
+        else None
+    )
+
+    dataframes = {}
+    pending_tables = []
+
+    for table in tables:
+        cache_file_path = build_cache_file_path(feed_cache_path, table)
+        if cache_file_path is not None and os.path.exists(cache_file_path):
+            dataframes[table] = pd.read_parquet(cache_file_path)
+        else:
+            pending_tables.append(table)
+
+    if len(pending_tables) == 0:
+        return dataframes
+
+    with zipfile.ZipFile(feed_file_path) as feed_zip:
+        for table in pending_tables:
+            dataframes[table] = read_gtfs_table(feed_zip, table)
+
+            cache_file_path = build_cache_file_path(feed_cache_path, table)
+            if cache_file_path is not None:
+                os.makedirs(feed_cache_path, exist_ok=True)
+
+                # Write to a temporary file first so that parallel runs never read partial files
+                temporary_file_path = f"{cache_file_path}.{os.getpid()}.tmp"
+                dataframes[table].to_parquet(temporary_file_path, index=False)
+                os.replace(temporary_file_path, cache_file_path)
+
+    return dataframes
+
+
+def read_gtfs_table(feed_zip: zipfile.ZipFile, table) -> pd.DataFrame:
+    columns = gtfs_columns[table]
+
+    # Feeds may be zipped with or without an enclosing directory
+    member_names = sorted(
+        [
+            name
+            for name in feed_zip.namelist()
+            if os.path.basename(name) == f"{table}.txt"
+        ],
+        key=len,
+    )
+
+    if len(member_names) == 0 or feed_zip.getinfo(member_names[0]).file_size == 0:
+        return build_empty_table(columns)
+
+    # Column names may be padded with whitespace, so types are assigned to the names as they appear in the header
+    with feed_zip.open(member_names[0]) as file:
+        header = pd.read_csv(file, encoding="utf-8-sig", nrows=0).columns
+    dtypes = {
+        column: columns[column.strip()]
+        for column in header
+        if column.strip() in columns
+    }
+
+    with feed_zip.open(member_names[0]) as file:
+        # Numbers are parsed directly, ids into categories, so that no column is held as strings of all its values
+        dataframe = pd.read_csv(
+            file,
+            encoding="utf-8-sig",
+            usecols=list(dtypes),
+            dtype=dtypes,
+            float_precision="round_trip",
+        )
+
+    dataframe = dataframe.rename(columns=lambda column: column.strip())
+
+    # Values may be padded with whitespace in the wild, numbers are parsed regardless
+    return dataframe.assign(
+        **{
+            column: (
+                strip_categories(dataframe[column])
+                if columns[column] == "category"
+                else dataframe[column].str.strip()
+            )
+            for column in dataframe.columns
+            if columns[column] in ["category", "str"]
+        }
+    )
+
+
+def strip_categories(column: pd.Series) -> pd.Series:
+    categories = column.cat.categories
+    stripped = categories.str.strip()
+
+    if stripped.equals(categories):
+        return column
+    if stripped.is_unique:
+        return column.cat.rename_categories(stripped)
+    return column.astype(object).str.strip().astype("category")
+
+
+def build_empty_table(columns: dict) -> pd.DataFrame:
+    return pd.DataFrame(
+        {column: pd.Series(dtype=dtype) for column, dtype in columns.items()}
+    )
+
+
+def build_cache_file_path(feed_cache_path, table):
+    if feed_cache_path is None:
+        return None
+
+    # Cached tables are invalidated whenever the columns read from a table change
+    columns_hash = hashlib.sha256(
+        json.dumps(gtfs_columns[table], sort_keys=True).encode()
+    ).hexdigest()[:8]
+
+    return os.path.join(feed_cache_path, f"{table}-{columns_hash}.parquet")
@@ -1,11 +1,12 @@
 import os
 
 import geopandas as gpd
+import numpy as np
 import pandas as pd
-import partridge as ptg
+import shapely
 from opendataproduct.config.data_transformation_gold_loader import DataTransformation
 from opendataproduct.tracking_decorator import TrackingDecorator
-from shapely.geometry import LineString
+from opendataproduct.transform.gtfs_feed_loader import load_gtfs_tables
 
 route_type_map = {
     # --- Standard GTFS route types ---
@@ -112,16 +113,43 @@ route_type_map = {
     1702: "horse-drawn-carriage",
 }
 
+# File extensions of the geodata formats mode layers can be written in
+geodata_file_extensions = {
+    "geojson": ".geojson",
+    "geoparquet": ".parquet",
+    "flatgeobuf": ".fgb",
+}
+
 
 @TrackingDecorator.track_time
 def convert_gtfs_to_geojson(
     data_transformation: DataTransformation,
     source_path,
     results_path,
+    simplify_tolerance=None,
+    coordinate_precision=None,
+    feed_cache_path=None,
+    service_date=None,
+    service_end_date=None,
+    geodata_formats=None,
     debug=False,
     clean=False,
     quiet=False,
 ):
+    if service_end_date is not None and service_date is None:
+        raise ValueError("✗️ Service end date requires a service date")
+
+    geodata_formats = geodata_formats or ["geojson"]
+
+    for geodata_format in geodata_formats:
+        if geodata_format not in geodata_file_extensions:
+            raise ValueError(f"✗️ Geodata format {geodata_format} is not supported")
+
+    # Calendars are only read if trips are restricted to service dates
+    tables = ["routes", "trips", "stops", "stop_times", "shapes"] + (
+        ["calendar", "calendar_dates"] if service_date is not None else []
+    )
+
     if data_transformation.input_ports:
         for input_port in data_transformation.input_ports:
             for file in input_port.files:
@@ -133,13 +161,29 @@ def convert_gtfs_to_geojson(
                 # Load and filter GTFS data
                 #
 
-                feed = ptg.load_feed(source_file_path)
+                feed = load_gtfs_tables(
+                    source_file_path, tables=tables, cache_path=feed_cache_path
+                )
 
-                routes = feed.routes
-                trips = feed.trips
-                stops = feed.stops
-                stop_times = feed.stop_times
-                shapes = feed.shapes
+                routes = feed["routes"]
+                trips = feed["trips"]
+                stops = feed["stops"]
+                stop_times = feed["stop_times"]
+                shapes = feed["shapes"]
+
+                # Drop trips not running on the service dates before any shape or stop time is touched
+                if service_date is not None:
+                    active_service_ids = get_active_service_ids(
+                        feed["calendar"],
+                        feed["calendar_dates"],
+                        service_date,
+                        service_end_date or service_date,
+                    )
+                    trips = trips[trips["service_id"].isin(active_service_ids)]
+
+                    debug and print(
+                        f"active trips: {len(trips)} of {len(feed["trips"])}"
+                    )
 
                 if debug:
                     print(
@@ -154,164 +198,389 @@ def convert_gtfs_to_geojson(
                 # Get unique modes
                 unique_modes = routes["mode_name"].unique()
 
+                target_file_paths = {
+                    mode: {
+                        geodata_format: os.path.join(
+                            results_path,
+                            input_port.id,
+                            file.target_file_name.replace(
+                                ".geojson",
+                                f"-{mode}{geodata_file_extensions[geodata_format]}",
+                            ),
+                        )
+                        for geodata_format in geodata_formats
+                    }
+                    for mode in unique_modes
+                }
+
+                # Check which results need to be generated
+                pending_modes = [
+                    mode
+                    for mode in unique_modes
+                    if clean
+                    or not all(
+                        os.path.exists(target_file_path)
+                        for target_file_path in target_file_paths[mode].values()
+                    )
+                ]
+
+                if len(pending_modes) == 0:
+                    continue
+
+                #
+                # Partition by mode
+                #
+
+                # Assign trips to the modes of their routes once instead of filtering trips per mode
+                mode_trips = trips.merge(
+                    routes[routes["mode_name"].isin(pending_modes)], on="route_id"
+                )
+
+                mode_shapes = split_shapes_by_mode(
+                    mode_trips, shapes, simplify_tolerance=simplify_tolerance
+                )
+                mode_stations = split_stations_by_mode(mode_trips, stop_times, stops)
+
                 # Iterative over modes
-                for mode in unique_modes:
-                    target_file_path = os.path.join(
-                        results_path,
-                        input_port.id,
-                        file.target_file_name.replace(".geojson", f"-{mode}.geojson"),
+                for mode in pending_modes:
+                    # Skip modes without trips
+                    if mode not in mode_stations:
+                        continue
+
+                    #
+                    # Process shapes
+                    #
+
+                    mode_shapes_gdf = mode_shapes.get(
+                        mode, gpd.GeoDataFrame(geometry=[], crs="EPSG:4326")
                     )
 
-                    # Check if result needs to be generated
-                    if clean or not os.path.exists(target_file_path):
-                        # Filter routes by mode
-                        mode_routes = routes[routes["mode_name"] == mode]
-                        mode_route_ids = mode_routes["route_id"].tolist()
-
-                        # Filter trips that use these routes
-                        mode_trips = trips[trips["route_id"].isin(mode_route_ids)]
-                        mode_trip_ids = mode_trips["trip_id"].tolist()
-
-                        if len(mode_trips) == 0:
-                            continue
-
-                        #
-                        # Process shapes
-                        #
-
-                        mode_shapes_gdf = gpd.GeoDataFrame()
-
-                        # Filter shapes used by these trips
-                        mode_shape_ids = mode_trips["shape_id"].unique()
-
-                        if not shapes.empty:
-                            # Only keep shapes for this mode
-                            relevant_shapes = shapes[
-                                shapes["shape_id"].isin(mode_shape_ids)
-                            ]
-
-                            if not relevant_shapes.empty:
-                                relevant_shapes = relevant_shapes.sort_values(
-                                    by=["shape_id", "shape_pt_sequence"]
-                                )
-                                lines = relevant_shapes.groupby("shape_id")[
-                                    ["shape_pt_lon", "shape_pt_lat"]
-                                ].apply(
-                                    lambda x: LineString(
-                                        list(zip(x.shape_pt_lon, x.shape_pt_lat))
-                                    )
-                                )
-                                mode_shapes_gdf = gpd.GeoDataFrame(
-                                    lines, columns=["geometry"], crs="EPSG:4326"
-                                )
-                                mode_shapes_gdf = mode_shapes_gdf.reset_index()
-                                mode_shapes_gdf.rename(
-                                    columns={mode_shapes_gdf.columns[0]: "shape_id"},
-                                    inplace=True,
-                                )
-
-                                # Add metadata
-                                dataframe_merged = mode_trips.merge(
-                                    mode_routes, on="route_id"
-                                )
-                                desired_cols = [
-                                    "shape_id",
-                                    "route_short_name",
-                                    "route_color",
-                                ]
-                                valid_cols = [
-                                    c
-                                    for c in desired_cols
-                                    if c in dataframe_merged.columns
-                                ]
-                                meta = dataframe_merged[valid_cols]
-                                meta = meta.drop_duplicates(subset=["shape_id"])
-
-                                mode_shapes_gdf = mode_shapes_gdf.merge(
-                                    meta, on="shape_id", how="left"
-                                )
-
-                                # Fix color format
-                                def fix_color(c):
-                                    return (
-                                        f"#{c}"
-                                        if pd.notnull(c) and not str(c).startswith("#")
-                                        else c
-                                    )
-
-                                if "route_color" in mode_shapes_gdf.columns:
-                                    mode_shapes_gdf["route_color"] = mode_shapes_gdf[
-                                        "route_color"
-                                    ].apply(fix_color)
-
-                                mode_shapes_gdf["feature_type"] = "route"
-
-                        #
-                        # Process stops
-                        #
-
-                        # Remove unused stops
-                        relevant_stop_times = stop_times[
-                            stop_times["trip_id"].isin(mode_trip_ids)
-                        ]
-                        active_stop_ids = relevant_stop_times["stop_id"].unique()
-                        active_stops = stops[
-                            stops["stop_id"].isin(active_stop_ids)
-                        ].copy()
-
-                        # Merge stops into stations
-                        unique_stations = (
-                            active_stops.groupby("stop_name")[["stop_lon", "stop_lat"]]
-                            .mean()
-                            .reset_index()
-                        )
+                    if not mode_shapes_gdf.empty:
+                        # Fix color format
+                        def fix_color(c):
+                            return (
+                                f"#{c}"
+                                if pd.notnull(c) and not str(c).startswith("#")
+                                else c
+                            )
 
-                        # Convert to geo data frame
-                        mode_stops_gdf = gpd.GeoDataFrame(
-                            unique_stations,
-                            geometry=gpd.points_from_xy(
-                                unique_stations.stop_lon, unique_stations.stop_lat
-                            ),
-                            crs="EPSG:4326",
-                        )
+                        if "route_color" in mode_shapes_gdf.columns:
+                            mode_shapes_gdf["route_color"] = mode_shapes_gdf[
+                                "route_color"
+                            ].apply(fix_color)
 
-                        # Cleanup columns
-                        desired_cols = [
-                            "stop_id",
-                            "stop_name",
-                            "feature_type",
-                            "geometry",
-                        ]
-                        valid_cols = [
-                            c for c in desired_cols if c in mode_stops_gdf.columns
-                        ]
-                        mode_stops_gdf = mode_stops_gdf[valid_cols]
-
-                        unified_gdf = pd.concat(
-                            [mode_stops_gdf, mode_shapes_gdf], ignore_index=True
-                        )
-                        unified_gdf = unified_gdf.fillna("")
+                        mode_shapes_gdf["feature_type"] = "route"
+
+                    #
+                    # Process stops
+                    #
 
+                    unique_stations = mode_stations[mode]
+
+                    # Convert to geo data frame
+                    mode_stops_gdf = gpd.GeoDataFrame(
+                        unique_stations,
+                        geometry=gpd.points_from_xy(
+                            unique_stations.stop_lon, unique_stations.stop_lat
+                        ),
+                        crs="EPSG:4326",
+                    )
+
+                    # Cleanup columns
+                    desired_cols = [
+                        "stop_id",
+                        "stop_name",
+                        "feature_type",
+                        "geometry",
+                    ]
+                    valid_cols = [
+                        c for c in desired_cols if c in mode_stops_gdf.columns
+                    ]
+                    mode_stops_gdf = mode_stops_gdf[valid_cols]
+
+                    unified_gdf = pd.concat(
+                        [mode_stops_gdf, mode_shapes_gdf], ignore_index=True
+                    )
+                    unified_gdf = decategorize(unified_gdf).fillna("")
+
+                    for geodata_format, target_file_path in target_file_paths[
+                        mode
+                    ].items():
                         if debug:
-                            save_dataframe_as_geojson(
+                            target_file_root, target_file_extension = os.path.splitext(
+                                target_file_path
+                            )
+                            save_dataframe_as_geodata(
                                 mode_stops_gdf,
-                                target_file_path.replace(".geojson", "-stops.geojson"),
+                                f"{target_file_root}-stops{target_file_extension}",
+                                geodata_format=geodata_format,
+                                coordinate_precision=coordinate_precision,
                             )
-                            save_dataframe_as_geojson(
+                            save_dataframe_as_geodata(
                                 mode_shapes_gdf,
-                                target_file_path.replace(".geojson", "-lines.geojson"),
+                                f"{target_file_root}-lines{target_file_extension}",
+                                geodata_format=geodata_format,
+                                coordinate_precision=coordinate_precision,
                             )
 
-                        save_dataframe_as_geojson(unified_gdf, target_file_path)
+                        save_dataframe_as_geodata(
+                            unified_gdf,
+                            target_file_path,
+                            geodata_format=geodata_format,
+                            coordinate_precision=coordinate_precision,
+                        )
 
                         not quiet and print(
                             f"✓ Convert {os.path.basename(source_file_path)} to {os.path.basename(target_file_path)}"
                         )
 
 
-def save_dataframe_as_geojson(gdf: pd.DataFrame, geojson_file_path):
+def get_active_service_ids(
+    calendar: pd.DataFrame, calendar_dates: pd.DataFrame, start_date, end_date
+) -> np.ndarray:
+    """
+    Resolves the services running on at least one day of a date range from weekly schedules and their exceptions
+    :param calendar: weekly schedules of services
+    :param calendar_dates: services added (exception_type 1) or removed (exception_type 2) on single dates
+    :param start_date: first service date, as date or string such as 20261016
+    :param end_date: last service date (inclusive), as date or string such as 20261016
+    :return: ids of active services
+    """
+    start_date = pd.Timestamp(str(start_date)).normalize()
+    end_date = pd.Timestamp(str(end_date)).normalize()
+
+    if end_date < start_date:
+        raise ValueError("✗️ Service end date must not be before service date")
+
+    weekdays = [
+        "monday",
+        "tuesday",
+        "wednesday",
+        "thursday",
+        "friday",
+        "saturday",
+        "sunday",
+    ]
+
+    # Pair each weekly schedule with each date of the range
+    service_dates = calendar.merge(
+        pd.DataFrame({"date": pd.date_range(start_date, end_date, freq="D")}),
+        how="cross",
+    )
+
+    runs_on_weekday = (
+        service_dates[weekdays].to_numpy()[
+            np.arange(len(service_dates)), service_dates["date"].dt.weekday.to_numpy()
+        ]
+        == 1
+    )
+    scheduled = service_dates[
+        runs_on_weekday
+        & (
+            service_dates["date"]
+            >= pd.to_datetime(service_dates["start_date"], format="%Y%m%d")
+        )
+        & (
+            service_dates["date"]
+            <= pd.to_datetime(service_dates["end_date"], format="%Y%m%d")
+        )
+    ][["service_id", "date"]].astype({"service_id": "object"})
+
+    exceptions = calendar_dates.assign(
+        date=pd.to_datetime(calendar_dates["date"], format="%Y%m%d")
+    ).astype({"service_id": "object"})
+    exceptions = exceptions[
+        (exceptions["date"] >= start_date) & (exceptions["date"] <= end_date)
+    ]
+
+    # Remove service dates cancelled by exceptions and add service dates added by them
+    removed = exceptions[exceptions["exception_type"] == 2][["service_id", "date"]]
+    added = exceptions[exceptions["exception_type"] == 1][["service_id", "date"]]
+
+    scheduled = scheduled.merge(removed, how="left", indicator=True)
+    scheduled = scheduled[scheduled["_merge"] == "left_only"]
+
+    return pd.concat([scheduled["service_id"], added["service_id"]]).unique()
+
+
+def split_shapes_by_mode(
+    mode_trips: pd.DataFrame, shapes: pd.DataFrame, simplify_tolerance=None
+) -> dict:
+    """
+    Builds the line of each shape used by trips once and splits the lines by the modes of the trips using them
+    :param mode_trips: trips with mode_name and route columns
+    :param shapes: shapes
+    :param simplify_tolerance: maximum distance in degrees that simplified lines may deviate, not simplified if not set
+    :return: geodataframe of lines with shape_id, route_short_name and route_color per mode
+    """
+    if shapes.empty:
+        return {}
+
+    # Only keep shapes used by trips
+    relevant_shapes = shapes[shapes["shape_id"].isin(mode_trips["shape_id"].unique())]
+
+    # Drop shapes with a single point, which do not make a line
+    relevant_shapes = relevant_shapes[
+        relevant_shapes.groupby("shape_id", observed=True)["shape_id"].transform("size")
+        > 1
+    ]
+
+    if relevant_shapes.empty:
+        return {}
+
+    relevant_shapes = relevant_shapes.sort_values(by=["shape_id", "shape_pt_sequence"])
+
+    # Build all lines in a single vectorized call, points of a shape are consecutive after sorting
+    indices, shape_ids = pd.factorize(relevant_shapes["shape_id"])
+    geometries = shapely.linestrings(
+        relevant_shapes[["shape_pt_lon", "shape_pt_lat"]].to_numpy(dtype=np.float64),
+        indices=indices,
+    )
+
+    if simplify_tolerance is not None:
+        geometries = shapely.simplify(
+            geometries, simplify_tolerance, preserve_topology=False
+        )
+
+    shapes_gdf = gpd.GeoDataFrame(
+        {"shape_id": shape_ids, "geometry": geometries}, crs="EPSG:4326"
+    )
+
+    # Add metadata of the first trip using a shape in each mode
+    desired_cols = [
+        "shape_id",
+        "route_short_name",
+        "route_color",
+    ]
+    valid_cols = [c for c in desired_cols if c in mode_trips.columns]
+    meta = mode_trips[valid_cols + ["mode_name"]]
+    meta = meta.drop_duplicates(subset=["mode_name", "shape_id"])
+
+    # A shape shared by trips of several modes becomes a line in each of them
+    shapes_gdf = shapes_gdf.merge(meta, on="shape_id")
+
+    return {
+        mode: mode_shapes_gdf.drop(columns="mode_name").reset_index(drop=True)
+        for mode, mode_shapes_gdf in shapes_gdf.groupby(
+            "mode_name", sort=False, observed=True
+        )
+    }
+
+
+def split_stations_by_mode(
+    mode_trips: pd.DataFrame, stop_times: pd.DataFrame, stops: pd.DataFrame
+) -> dict:
+    """
+    Splits stops by the modes of the trips serving them in a single pass over stop times and merges stops into
+    stations by name
+    :param mode_trips: trips with mode_name column
+    :param stop_times: stop times
+    :param stops: stops
+    :return: dataframe of stations with stop_name, stop_lon and stop_lat per mode that has trips
+    """
+    trip_modes = mode_trips.drop_duplicates(subset=["trip_id"]).set_index("trip_id")[
+        "mode_name"
+    ]
+
+    # Remove unused stops
+    active_stops = (
+        pd.DataFrame(
+            {
+                "stop_id": stop_times["stop_id"],
+                "mode_name": stop_times["trip_id"].map(trip_modes),
+            }
+        )
+        .dropna(subset=["mode_name"])
+        .drop_duplicates()
+    )
+    active_stops = stops.merge(active_stops, on="stop_id")
+
+    # Merge stops into stations
+    unique_stations = (
+        active_stops.groupby(["mode_name", "stop_name"], observed=True)[
+            ["stop_lon", "stop_lat"]
+        ]
+        .mean()
+        .reset_index()
+    )
+
+    mode_stations = {
+        mode: mode_stations.drop(columns="mode_name").reset_index(drop=True)
+        for mode, mode_stations in unique_stations.groupby(
+            "mode_name", sort=False, observed=True
+        )
+    }
+
+    # Modes whose trips have no stop times still get a file without stations
+    for mode in trip_modes.unique():
+        if mode not in mode_stations:
+            mode_stations[mode] = unique_stations.drop(columns="mode_name").iloc[0:0]
+
+    return mode_stations
+
+
+def decategorize(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Converts categorical id columns back to plain values since output drivers have no categorical type
+    :param df: dataframe
+    :return: dataframe without categorical columns
+    """
+    return df.astype(
+        {column: "object" for column in df.select_dtypes("category").columns}
+    )
+
+
+def save_dataframe_as_geodata(
+    gdf: pd.DataFrame,
+    file_path,
+    geodata_format="geojson",
+    coordinate_precision=None,
+):
+    """
+    Saves a mode layer as geojson, geoparquet or flatgeobuf file
+    :param gdf: geodataframe
+    :param file_path: file path
+    :param geodata_format: geojson, geoparquet or flatgeobuf
+    :param coordinate_precision: number of decimals of coordinates, not rounded if not set
+    :return:
+    """
     # Make results path
-    os.makedirs(os.path.dirname(geojson_file_path), exist_ok=True)
-
-    # Save as geojson
-    gdf.to_file(geojson_file_path, driver="GeoJSON")
+    os.makedirs(os.path.dirname(file_path), exist_ok=True)
+
+    gdf = decategorize(gdf)
+
+    if coordinate_precision is not None and "geometry" in gdf.columns:
+        # Round coordinates to a number of decimals, 5 decimals are about 1 m
+        gdf = gdf.set_geometry(
+            shapely.set_precision(
+                gdf.geometry.values,
+                grid_size=10**-coordinate_precision,
+                mode="pointwise",
+            )
+        )
+
+    if geodata_format == "geojson":
+        if coordinate_precision is None or "geometry" not in gdf.columns:
+            gdf.to_file(file_path, driver="GeoJSON")
+        else:
+            gdf.to_file(
+                file_path,
+                driver="GeoJSON",
+                COORDINATE_PRECISION=coordinate_precision,
+            )
+    elif geodata_format == "geoparquet":
+        # Order features along a hilbert curve and store their bounding boxes so that readers can skip row groups
+        # and features outside of the area they request
+        if len(gdf) > 0:
+            gdf = gdf.iloc[np.argsort(gdf.hilbert_distance().to_numpy(), kind="stable")]
+
+        gdf.to_parquet(file_path, index=False, write_covering_bbox=True)
+    elif geodata_format == "flatgeobuf":
+        # FlatGeobuf files contain a packed spatial index that clients query by bounding box over http range requests
+        gdf.to_file(
+            file_path,
+            driver="FlatGeobuf",
+            engine="pyogrio",
+            use_arrow=True,
+            SPATIAL_INDEX="YES",
+        )
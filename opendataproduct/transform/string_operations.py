@@ -0,0 +1,228 @@
+import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+import pyarrow.parquet as pq
+from pandas.api.types import infer_dtype
+
+STRING_DTYPE_ARROW = "string[pyarrow]"
+
+
+def is_string_column(column: pd.Series) -> bool:
+    """
+    Checks if a column only contains strings
+    :param column: column
+    :return: True if all values of the column are strings
+    """
+    if isinstance(column.dtype, pd.StringDtype):
+        return True
+    if isinstance(column.dtype, pd.ArrowDtype):
+        return column.dtype.pyarrow_dtype in [pa.string(), pa.large_string()]
+    return column.dtype == object and infer_dtype(column, skipna=False) in [
+        "string",
+        "empty",
+    ]
+
+
+def is_arrow_column(column: pd.Series) -> bool:
+    return isinstance(column.dtype, pd.ArrowDtype) or (
+        isinstance(column.dtype, pd.StringDtype) and column.dtype.storage == "pyarrow"
+    )
+
+
+def apply_to_strings(dataframe: pd.DataFrame, operation) -> pd.DataFrame:
+    """
+    Applies a vectorized string operation to all columns containing strings, other values are left untouched
+    :param dataframe: dataframe
+    :param operation: function that takes and returns a string column
+    :return: dataframe
+    """
+    columns = {}
+
+    for column_name, column in dataframe.items():
+        if is_string_column(column):
+            columns[column_name] = operation(column)
+        elif column.dtype == object:
+            # Columns mixing strings and other values only get their strings converted
+            is_string = column.map(lambda value: isinstance(value, str)).astype(bool)
+            if is_string.any():
+                columns[column_name] = column.where(
+                    ~is_string, operation(column[is_string].astype(str))
+                )
+
+    return dataframe.assign(**columns) if columns else dataframe
+
+
+def strip_strings(dataframe: pd.DataFrame) -> pd.DataFrame:
+    return apply_to_strings(dataframe, lambda column: column.str.strip())
+
+
+def remove_line_breaks(dataframe: pd.DataFrame) -> pd.DataFrame:
+    return apply_to_strings(
+        dataframe, lambda column: column.str.replace(r"[\r\n]", "", regex=True)
+    )
+
+
+def to_string(column: pd.Series) -> pd.Series:
+    """
+    Converts a column to strings, arrow-backed columns stay arrow-backed and render missing values as empty strings
+    :param column: column
+    :return: string column
+    """
+    if is_arrow_column(column):
+        return column.astype(STRING_DTYPE_ARROW).fillna("")
+    return column.astype(str)
+
+
+def to_strings(dataframe: pd.DataFrame) -> pd.DataFrame:
+    return dataframe.apply(to_string)
+
+
+def concat_strings(dataframe: pd.DataFrame, names, delimiter="") -> pd.Series:
+    """
+    Concatenates string columns element-wise
+    :param dataframe: dataframe
+    :param names: names of columns to concatenate
+    :param delimiter: delimiter
+    :return: concatenated column
+    """
+    return dataframe[names[0]].str.cat(
+        [dataframe[name] for name in names[1:]], sep=delimiter
+    )
+
+
+def read_csv_as_arrow_strings(
+    file_path, encoding="utf-8", delimiter=","
+) -> pd.DataFrame:
+    """
+    Reads a csv file with the pyarrow parser into arrow-backed string columns. Types are declared up front because
+    pandas' pyarrow engine infers numbers first, which drops leading zeros
+    :param file_path: file path
+    :param encoding: encoding
+    :param delimiter: delimiter
+    :return: dataframe
+    """
+    table = read_csv_as_arrow_table(file_path, encoding=encoding, delimiter=delimiter)
+    return table.to_pandas(types_mapper={pa.string(): pd.StringDtype("pyarrow")}.get)
+
+
+def read_csv_as_arrow_table(
+    file_path, columns=None, encoding="utf-8", delimiter=","
+) -> pa.Table:
+    """
+    Reads a csv file with the pyarrow parser into an arrow table of string columns
+    :param file_path: file path
+    :param columns: names of columns to parse, others are skipped, all columns if not set
+    :param encoding: encoding
+    :param delimiter: delimiter
+    :return: table
+    """
+    read_options = pa_csv.ReadOptions(encoding=encoding)
+    parse_options = pa_csv.ParseOptions(delimiter=delimiter)
+
+    with pa_csv.open_csv(
+        file_path, read_options=read_options, parse_options=parse_options
+    ) as reader:
+        column_names = [
+            column_name
+            for column_name in reader.schema.names
+            if columns is None or column_name in columns
+        ]
+
+    return pa_csv.read_csv(
+        file_path,
+        read_options=read_options,
+        parse_options=parse_options,
+        convert_options=pa_csv.ConvertOptions(
+            column_types={column_name: pa.string() for column_name in column_names},
+            include_columns=column_names if columns is not None else [],
+            strings_can_be_null=False,
+            quoted_strings_can_be_null=False,
+        ),
+    )
+
+
+def read_parquet_as_strings(
+    file_path, columns=None, dtype_backend=None
+) -> pd.DataFrame:
+    """
+    Reads a parquet file into string columns that hold the same values as reading its csv counterpart with dtype=str
+    :param file_path: file path
+    :param columns: names of columns to read, others are skipped, all columns if not set
+    :param dtype_backend: pyarrow to return arrow-backed string columns
+    :return: dataframe
+    """
+    parquet_file = pq.ParquetFile(file_path)
+    return table_to_strings(
+        parquet_file.read(columns=select_columns(parquet_file, columns)),
+        dtype_backend,
+    )
+
+
+def iter_parquet_as_strings(file_path, chunk_size, columns=None, dtype_backend=None):
+    """
+    Reads a parquet file in chunks of string columns. A file without rows yields one empty chunk with its columns
+    like pandas' csv reader does
+    :param file_path: file path
+    :param chunk_size: number of rows per chunk
+    :param columns: names of columns to read, others are skipped, all columns if not set
+    :param dtype_backend: pyarrow to return arrow-backed string columns
+    :return: chunks
+    """
+    parquet_file = pq.ParquetFile(file_path)
+    column_names = select_columns(parquet_file, columns)
+
+    if parquet_file.metadata.num_rows == 0:
+        yield table_to_strings(
+            parquet_file.schema_arrow.empty_table().select(column_names),
+            dtype_backend,
+        )
+        return
+
+    for batch in parquet_file.iter_batches(batch_size=chunk_size, columns=column_names):
+        yield table_to_strings(pa.Table.from_batches([batch]), dtype_backend)
+
+
+def iter_csv_as_strings(file_path, chunk_size, dtype_backend=None):
+    """
+    Reads a csv file in chunks of string columns
+    :param file_path: file path
+    :param chunk_size: number of rows per chunk
+    :param dtype_backend: pyarrow to return arrow-backed string columns
+    :return: chunks
+    """
+    with pd.read_csv(
+        file_path,
+        dtype=STRING_DTYPE_ARROW if dtype_backend == "pyarrow" else str,
+        keep_default_na=False,
+        chunksize=chunk_size,
+    ) as chunks:
+        yield from chunks
+
+
+def select_columns(parquet_file: pq.ParquetFile, columns=None):
+    return [
+        name
+        for name in parquet_file.schema_arrow.names
+        if columns is None or name in columns
+    ]
+
+
+def table_to_strings(table: pa.Table, dtype_backend=None) -> pd.DataFrame:
+    """
+    Renders the columns of an arrow table as strings the way pandas writes them to csv, missing values become empty
+    strings
+    :param table: table
+    :param dtype_backend: pyarrow to return arrow-backed string columns
+    :return: dataframe
+    """
+    dataframe = table.to_pandas()
+
+    return pd.DataFrame(
+        {
+            column_name: column.astype(str)
+            .where(column.notna(), "")
+            .astype(STRING_DTYPE_ARROW if dtype_backend == "pyarrow" else object)
+            for column_name, column in dataframe.items()
+        },
+        index=dataframe.index,
+    )
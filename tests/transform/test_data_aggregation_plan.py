@@ -0,0 +1,121 @@
+import pandas as pd
+
+from opendataproduct.config.data_transformation_gold_loader import File, Filter, Name
+from opendataproduct.transform.data_aggregation_plan import (
+    ExecutionContext,
+    compile_aggregation_plan,
+)
+
+
+def build_file(aggregate_by=None) -> File:
+    return File(
+        geojson_template_file_name=None,
+        source_file_name="source.csv",
+        target_file_name="target.csv",
+        aggregate_by=aggregate_by,
+        names=[
+            Name(name="id", copy="district_id", zfill=2),
+            Name(name="district_id", zfill=3),
+            Name(name="inhabitants"),
+        ],
+    )
+
+
+def test_copy_takes_zero_filled_value_without_aggregation():
+    dataframe = pd.DataFrame(
+        {"district_id": ["1", "12"], "inhabitants": ["10", "20"]}, dtype=object
+    )
+
+    result = compile_aggregation_plan(build_file()).execute(
+        dataframe, ExecutionContext()
+    )
+
+    assert result["id"].tolist() == ["001", "012"]
+    assert result["district_id"].tolist() == ["001", "012"]
+    assert result["inhabitants"].tolist() == ["10", "20"]
+
+
+def test_copy_takes_aggregated_value_after_aggregation():
+    dataframe = pd.DataFrame(
+        {"district_id": ["1", "1", "12"], "inhabitants": ["10", "5", "20"]},
+        dtype=object,
+    )
+
+    result = compile_aggregation_plan(build_file(aggregate_by="district_id")).execute(
+        dataframe, ExecutionContext()
+    )
+
+    # Aggregation parses ids into numbers, so copies are zero-filled again
+    assert result["id"].tolist() == ["01", "12"]
+    assert result["district_id"].tolist() == ["001", "012"]
+    assert result["inhabitants"].tolist() == [15, 20]
+
+
+def build_measures_file(aggregate_measures) -> File:
+    return File(
+        geojson_template_file_name=None,
+        source_file_name="source.csv",
+        target_file_name="target.csv",
+        aggregate_by="id",
+        aggregate_measures=aggregate_measures,
+        names=[
+            Name(name="id"),
+            Name(name="female", type="int64"),
+            Name(name="male"),
+        ],
+    )
+
+
+def build_measures_dataframe() -> pd.DataFrame:
+    return pd.DataFrame(
+        {
+            "id": ["02", "01", "02"],
+            "female": ["1", "2", "3"],
+            "male": ["4", "5", "6"],
+        },
+        dtype=object,
+    )
+
+
+def test_numeric_types_do_not_switch_on_measures():
+    result = compile_aggregation_plan(build_measures_file(False)).execute(
+        build_measures_dataframe(), ExecutionContext()
+    )
+
+    assert result.columns.tolist() == ["id", "female", "male"]
+    assert result["id"].tolist() == [1, 2]
+    assert result["female"].tolist() == [2, 4]
+    assert result["male"].tolist() == [5, 10]
+
+
+def test_measures_keep_untyped_columns_and_dimension_types():
+    result = compile_aggregation_plan(build_measures_file(True)).execute(
+        build_measures_dataframe(), ExecutionContext()
+    )
+
+    assert result.columns.tolist() == ["id", "female", "male"]
+    assert result["id"].dtype == object
+    assert result["id"].tolist() == ["01", "02"]
+    assert result["female"].tolist() == [2, 4]
+    assert result["male"].tolist() == [5, 10]
+
+
+def test_filter_is_not_moved_ahead_of_type():
+    file = File(
+        geojson_template_file_name=None,
+        source_file_name="source.csv",
+        target_file_name="target.csv",
+        names=[Name(name="k"), Name(name="b", type="float")],
+        filters=[Filter(key="k", operation="does_not_equal", value="drop")],
+    )
+    dataframe = pd.DataFrame(
+        {"k": ["keep", "drop", "keep"], "b": ["1", "x", "2"]}, dtype=object
+    )
+
+    plan = compile_aggregation_plan(file)
+    result = plan.execute(dataframe, ExecutionContext())
+
+    operations = [step.operation for step in plan.steps]
+    assert operations.index("type") < operations.index("filter")
+    # Type is not applied because one value of the unfiltered column is not a number
+    assert result["b"].tolist() == ["1", "2"]
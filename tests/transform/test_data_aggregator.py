@@ -0,0 +1,187 @@
+import os
+
+import pandas as pd
+import pytest
+
+from opendataproduct.config.data_transformation_gold_loader import (
+    DataTransformation,
+    File,
+    Filter,
+    InputPort,
+    Name,
+)
+from opendataproduct.transform.data_aggregator import aggregate_data
+
+
+def aggregate(source_path, results_path, file, chunk_size=None, engine=None):
+    aggregate_data(
+        DataTransformation(input_ports=[InputPort(id="port", files=[file])]),
+        source_path,
+        results_path,
+        chunk_size=chunk_size,
+        engine=engine,
+        clean=True,
+        quiet=True,
+    )
+
+    with open(os.path.join(results_path, "port-csv", "target.csv"), "rb") as csv_file:
+        csv = csv_file.read()
+    return csv, pd.read_parquet(
+        os.path.join(results_path, "port-parquet", "target.parquet")
+    )
+
+
+def build_file(aggregate_by=None) -> File:
+    return File(
+        geojson_template_file_name=None,
+        source_file_name="source.csv",
+        target_file_name="target.csv",
+        aggregate_by=aggregate_by,
+        names=[Name(name="k"), Name(name="b", type="float")],
+    )
+
+
+def write_csv_source(source_path):
+    with open(os.path.join(source_path, "source.csv"), "w") as csv_file:
+        csv_file.write("k,b\nkeep,1\ndrop,x\nkeep,2\n")
+
+
+def write_empty_parquet_source(source_path):
+    with open(os.path.join(source_path, "source.csv"), "w") as csv_file:
+        csv_file.write("k,b\n")
+
+    # Typed silver parquet file without rows, written after the csv file
+    pd.DataFrame(
+        {"k": pd.Series([], dtype=str), "b": pd.Series([], dtype="int64")}
+    ).to_parquet(os.path.join(source_path, "source.parquet"))
+
+
+@pytest.mark.parametrize(
+    "write_source, aggregate_by",
+    [
+        (write_csv_source, None),
+        (write_csv_source, "total"),
+        (write_empty_parquet_source, None),
+        (write_empty_parquet_source, "total"),
+    ],
+)
+def test_chunks_give_same_result_as_whole_source(tmp_path, write_source, aggregate_by):
+    source_path = tmp_path / "source"
+    os.makedirs(source_path / "port")
+    write_source(source_path / "port")
+
+    csv, parquet = aggregate(
+        source_path, tmp_path / "whole", build_file(aggregate_by), None
+    )
+    chunked_csv, chunked_parquet = aggregate(
+        source_path, tmp_path / "chunks", build_file(aggregate_by), 1
+    )
+
+    assert chunked_csv == csv
+    pd.testing.assert_frame_equal(chunked_parquet, parquet)
+
+
+ENGINE_CASES = {
+    "aggregation": (
+        "k,b\nx,1\ny,2\nx,3\n",
+        File(
+            geojson_template_file_name=None,
+            source_file_name="source.csv",
+            target_file_name="target.csv",
+            aggregate_by="k",
+            aggregate_measures=True,
+            names=[Name(name="k"), Name(name="b", type="int")],
+        ),
+    ),
+    "blank_lines": (
+        "\nk,b\nx,1\n\ny,2\n\n",
+        File(
+            geojson_template_file_name=None,
+            source_file_name="source.csv",
+            target_file_name="target.csv",
+            names=[Name(name="k"), Name(name="b")],
+        ),
+    ),
+    "floats": (
+        "k,b\nx,1.5\ny,2\nz,3\n",
+        File(
+            geojson_template_file_name=None,
+            source_file_name="source.csv",
+            target_file_name="target.csv",
+            names=[Name(name="k"), Name(name="b", type="float")],
+        ),
+    ),
+    "empty_floats": (
+        "k,b\nx,1.5\ny,2\nz,\n",
+        File(
+            geojson_template_file_name=None,
+            source_file_name="source.csv",
+            target_file_name="target.csv",
+            names=[Name(name="k"), Name(name="b", type="float")],
+        ),
+    ),
+    "failing_cast": (
+        "k,b\nkeep,1\ndrop,x\nkeep,2\n",
+        File(
+            geojson_template_file_name=None,
+            source_file_name="source.csv",
+            target_file_name="target.csv",
+            names=[Name(name="k"), Name(name="b", type="int")],
+            filters=[Filter(key="k", operation="equals", value="keep")],
+        ),
+    ),
+    "failing_cast_aggregation": (
+        "k,b\nkeep,1\ndrop,x\nkeep,2\n",
+        File(
+            geojson_template_file_name=None,
+            source_file_name="source.csv",
+            target_file_name="target.csv",
+            aggregate_by="total",
+            names=[Name(name="k"), Name(name="b", type="float")],
+            filters=[Filter(key="k", operation="equals", value="keep")],
+        ),
+    ),
+    "matches": (
+        "k,b\na1,1\nb2,2\na3,\n,4\n",
+        File(
+            geojson_template_file_name=None,
+            source_file_name="source.csv",
+            target_file_name="target.csv",
+            names=[Name(name="k"), Name(name="b")],
+            filters=[Filter(key="k", operation="matches", value=r"^a\d$")],
+        ),
+    ),
+}
+
+
+def write_engine_source(source_path, csv, source):
+    with open(os.path.join(source_path, "source.csv"), "w") as csv_file:
+        csv_file.write(csv)
+
+    # Silver parquet files of strings or of inferred types, written after the csv file
+    if source == "parquet":
+        pd.read_csv(
+            os.path.join(source_path, "source.csv"), dtype=str, keep_default_na=False
+        ).to_parquet(os.path.join(source_path, "source.parquet"))
+    elif source == "typed_parquet":
+        pd.read_csv(os.path.join(source_path, "source.csv")).to_parquet(
+            os.path.join(source_path, "source.parquet")
+        )
+
+
+@pytest.mark.parametrize("source", ["csv", "parquet", "typed_parquet"])
+@pytest.mark.parametrize("case", ENGINE_CASES)
+def test_polars_engine_gives_same_result_as_default(tmp_path, case, source):
+    pytest.importorskip("polars")
+    csv, file = ENGINE_CASES[case]
+    source_path = tmp_path / "source"
+    os.makedirs(source_path / "port")
+    write_engine_source(source_path / "port", csv, source)
+
+    default_csv, default_parquet = aggregate(source_path, tmp_path / "default", file)
+    polars_csv, polars_parquet = aggregate(
+        source_path, tmp_path / "polars", file, engine="polars"
+    )
+
+    assert polars_csv == default_csv
+    pd.testing.assert_frame_equal(polars_parquet, default_parquet)
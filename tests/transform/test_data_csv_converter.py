@@ -0,0 +1,171 @@
+import os
+
+import pandas as pd
+import pytest
+
+from opendataproduct.config.data_transformation_silver_loader import (
+    DataTransformation,
+    Dataset,
+    File,
+    InputPort,
+    Name,
+)
+from opendataproduct.transform.data_csv_converter import convert_data_to_csv
+
+
+def convert(
+    source_path,
+    results_path,
+    source_file_name,
+    head,
+    dtype_backend,
+    declare_types=False,
+    skip_rows=0,
+):
+    convert_data_to_csv(
+        DataTransformation(
+            input_ports=[
+                InputPort(
+                    id="port",
+                    files=[
+                        File(
+                            source_file_name=source_file_name,
+                            target_file_name=source_file_name,
+                            datasets=[
+                                Dataset(
+                                    target_file_name="target.csv",
+                                    sheet_name="data",
+                                    header=0,
+                                    names=[
+                                        Name(name="id"),
+                                        Name(name="value", type="int"),
+                                        Name(name="share"),
+                                    ],
+                                    head=head,
+                                    declare_types=declare_types,
+                                    skip_rows=skip_rows,
+                                )
+                            ],
+                        )
+                    ],
+                )
+            ]
+        ),
+        source_path,
+        results_path,
+        dtype_backend=dtype_backend,
+        clean=True,
+        quiet=True,
+    )
+    return pd.read_csv(
+        os.path.join(results_path, "port", "target.csv"),
+        dtype=str,
+        keep_default_na=False,
+    )
+
+
+@pytest.mark.parametrize("dtype_backend", [None, "pyarrow"])
+@pytest.mark.parametrize("source_file_name", ["source.csv", "source.xlsx"])
+def test_head_keeps_types_inferred_from_all_rows(
+    tmp_path, source_file_name, dtype_backend
+):
+    source = pd.DataFrame(
+        {
+            "id": ["01", "02", "03", "04"],
+            "value": [1, 2, 3, 1.5],
+            "share": [1, 2, 3, 0.5],
+        }
+    )
+    os.makedirs(tmp_path / "source" / "port")
+    source_file_path = tmp_path / "source" / "port" / source_file_name
+    if source_file_name.endswith(".csv"):
+        source.to_csv(source_file_path, index=False)
+    else:
+        source.to_excel(source_file_path, sheet_name="data", index=False)
+
+    full = convert(
+        tmp_path / "source", tmp_path / "full", source_file_name, None, dtype_backend
+    )
+    head = convert(
+        tmp_path / "source", tmp_path / "head", source_file_name, 3, dtype_backend
+    )
+
+    assert len(full) == 4
+    pd.testing.assert_frame_equal(head, full.head(3))
+
+
+def write_source(tmp_path, source_file_name, source: pd.DataFrame, skip_rows=0):
+    os.makedirs(tmp_path / "source" / "port")
+    source_file_path = tmp_path / "source" / "port" / source_file_name
+    if source_file_name.endswith(".csv"):
+        with open(source_file_path, "w") as csv_file:
+            csv_file.write("comment\n" * skip_rows)
+            source.to_csv(csv_file, index=False)
+    else:
+        source.to_excel(
+            source_file_path, sheet_name="data", index=False, startrow=skip_rows
+        )
+
+
+@pytest.mark.parametrize("dtype_backend", [None, "pyarrow"])
+@pytest.mark.parametrize("source_file_name", ["source.csv", "source.xlsx"])
+def test_declared_types_are_read_with_head(tmp_path, source_file_name, dtype_backend):
+    write_source(
+        tmp_path,
+        source_file_name,
+        pd.DataFrame(
+            {
+                "id": ["01", "02", "03", "04"],
+                "value": [1, 2, 3, 4],
+                "share": [1, 2, 3, 0.5],
+            }
+        ),
+    )
+
+    full = convert(
+        tmp_path / "source",
+        tmp_path / "full",
+        source_file_name,
+        None,
+        dtype_backend,
+        declare_types=True,
+    )
+    head = convert(
+        tmp_path / "source",
+        tmp_path / "head",
+        source_file_name,
+        3,
+        dtype_backend,
+        declare_types=True,
+    )
+
+    # Strings are read as they are, so leading zeros are kept
+    assert head["id"].tolist() == ["01", "02", "03"]
+    assert head["value"].tolist() == ["1", "2", "3"]
+    pd.testing.assert_frame_equal(head, full.head(3))
+
+
+@pytest.mark.parametrize("declare_types", [False, True])
+def test_backends_skip_rows_before_header(tmp_path, declare_types):
+    write_source(
+        tmp_path,
+        "source.csv",
+        pd.DataFrame({"id": ["a", "b"], "value": [1, 2], "share": [0.5, 1]}),
+        skip_rows=2,
+    )
+
+    results = [
+        convert(
+            tmp_path / "source",
+            tmp_path / str(dtype_backend),
+            "source.csv",
+            None,
+            dtype_backend,
+            declare_types=declare_types,
+            skip_rows=2,
+        )
+        for dtype_backend in [None, "pyarrow"]
+    ]
+
+    assert results[0]["id"].tolist() == ["a", "b"]
+    pd.testing.assert_frame_equal(results[1], results[0])
@@ -0,0 +1,58 @@
+import os
+
+import duckdb
+import pandas as pd
+import pytest
+
+from opendataproduct.config.data_transformation_sql_loader import Table
+from opendataproduct.transform.data_reader import get_silver_parquet_file_path
+from opendataproduct.transform.data_sql_transformer import register_table
+
+
+def write_silver_files(path, parquet_age):
+    csv_file_path = os.path.join(path, "source.csv")
+    parquet_file_path = os.path.join(path, "source.parquet")
+
+    with open(csv_file_path, "w") as csv_file:
+        csv_file.write("id\n01\n")
+    pd.DataFrame({"id": ["parquet"]}).to_parquet(parquet_file_path)
+
+    # Parquet file with other values than the csv file, older by parquet_age seconds
+    modified = os.path.getmtime(csv_file_path)
+    os.utime(parquet_file_path, (modified - parquet_age, modified - parquet_age))
+    return csv_file_path, parquet_file_path
+
+
+@pytest.mark.parametrize("parquet_age, use_parquet", [(0, True), (10, False)])
+def test_parquet_file_is_used_unless_stale(tmp_path, parquet_age, use_parquet):
+    csv_file_path, parquet_file_path = write_silver_files(tmp_path, parquet_age)
+
+    assert get_silver_parquet_file_path(csv_file_path) == (
+        parquet_file_path if use_parquet else None
+    )
+
+    connection = duckdb.connect()
+    register_table(
+        connection, Table(name="t", source_file_name="source.csv"), csv_file_path
+    )
+
+    assert connection.sql("select id from t").fetchall() == [
+        ("parquet",) if use_parquet else ("01",)
+    ]
+
+
+def test_parquet_file_is_used_without_csv_file(tmp_path):
+    parquet_file_path = os.path.join(tmp_path, "source.parquet")
+    pd.DataFrame({"id": ["parquet"]}).to_parquet(parquet_file_path)
+
+    assert (
+        get_silver_parquet_file_path(os.path.join(tmp_path, "source.csv"))
+        == parquet_file_path
+    )
+
+
+def test_csv_file_is_used_without_parquet_file(tmp_path):
+    with open(os.path.join(tmp_path, "source.csv"), "w") as csv_file:
+        csv_file.write("id\n01\n")
+
+    assert get_silver_parquet_file_path(os.path.join(tmp_path, "source.csv")) is None
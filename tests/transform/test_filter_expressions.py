@@ -0,0 +1,121 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from opendataproduct.config.data_transformation_gold_loader import Filter
+from opendataproduct.transform.filter_expressions import (
+    FILTER_OPERATIONS,
+    build_filter_mask,
+)
+
+T, F = True, False
+
+STRINGS = ["a1", "b2", "", None, "a3"]
+NUMBER_STRINGS = ["1", "2", "", "x", "10"]
+NUMBERS = [1.0, 2.0, np.nan, 10.0]
+
+CASES = [
+    # Strings, missing values never match
+    (STRINGS, Filter(key="k", operation="equals", value="a1"), [T, F, F, F, F]),
+    (STRINGS, Filter(key="k", operation="does_not_equal", value="a1"), [F, T, T, T, T]),
+    (STRINGS, Filter(key="k", operation="starts_with", value="a"), [T, F, F, F, T]),
+    (
+        STRINGS,
+        Filter(key="k", operation="does_not_start_with", value="a"),
+        [F, T, T, T, F],
+    ),
+    (STRINGS, Filter(key="k", operation="ends_with", value="2"), [F, T, F, F, F]),
+    (
+        STRINGS,
+        Filter(key="k", operation="does_not_end_with", value="2"),
+        [T, F, T, T, T],
+    ),
+    (STRINGS, Filter(key="k", operation="in", value=["a1", "b2"]), [T, T, F, F, F]),
+    (STRINGS, Filter(key="k", operation="not_in", value=["a1", "b2"]), [F, F, T, T, T]),
+    (STRINGS, Filter(key="k", operation="in", value="a1"), [T, F, F, F, F]),
+    (STRINGS, Filter(key="k", operation="not_in", value="a1"), [F, T, T, T, T]),
+    (STRINGS, Filter(key="k", operation="matches", value=r"^a\d$"), [T, F, F, F, T]),
+    (
+        STRINGS,
+        Filter(key="k", operation="does_not_match", value=r"^a\d$"),
+        [F, T, T, T, F],
+    ),
+    (STRINGS, Filter(key="k", operation="is_null"), [F, F, T, T, F]),
+    (STRINGS, Filter(key="k", operation="is_not_null"), [T, T, F, F, T]),
+    # Strings compared as numbers, values that are not numbers never match
+    (
+        NUMBER_STRINGS,
+        Filter(key="k", operation="between", min=2, max=10),
+        [F, T, F, F, T],
+    ),
+    (NUMBER_STRINGS, Filter(key="k", operation="between", max=2), [T, T, F, F, F]),
+    (
+        NUMBER_STRINGS,
+        Filter(key="k", operation="greater_than", value=2),
+        [F, F, F, F, T],
+    ),
+    (
+        NUMBER_STRINGS,
+        Filter(key="k", operation="greater_than_or_equal", value="2"),
+        [F, T, F, F, T],
+    ),
+    (NUMBER_STRINGS, Filter(key="k", operation="less_than", value=2), [T, F, F, F, F]),
+    (
+        NUMBER_STRINGS,
+        Filter(key="k", operation="less_than_or_equal", value=2),
+        [T, T, F, F, F],
+    ),
+    (NUMBER_STRINGS, Filter(key="k", operation="equals", value=2), [F, T, F, F, F]),
+    # Numbers, values are converted into the type of the column
+    (NUMBERS, Filter(key="k", operation="equals", value="2"), [F, T, F, F]),
+    (NUMBERS, Filter(key="k", operation="does_not_equal", value=2), [T, F, T, T]),
+    (NUMBERS, Filter(key="k", operation="in", value=[1, "10"]), [T, F, F, T]),
+    (NUMBERS, Filter(key="k", operation="in", value=2), [F, T, F, F]),
+    (NUMBERS, Filter(key="k", operation="not_in", value=2), [T, F, T, T]),
+    (NUMBERS, Filter(key="k", operation="between", min=1, max=2), [T, T, F, F]),
+    (NUMBERS, Filter(key="k", operation="greater_than", value=1), [F, T, F, T]),
+    (NUMBERS, Filter(key="k", operation="is_null"), [F, F, T, F]),
+    (NUMBERS, Filter(key="k", operation="is_not_null"), [T, T, F, T]),
+]
+
+
+@pytest.mark.parametrize("values, filter, expected", CASES)
+def test_filter_operation(values, filter, expected):
+    dataframe = pd.DataFrame({"k": values})
+
+    assert build_filter_mask(dataframe, [filter]).tolist() == expected
+
+
+@pytest.mark.parametrize(
+    "filter, expected",
+    [(filter, expected) for values, filter, expected in CASES if values is STRINGS],
+)
+def test_filter_operation_on_arrow_strings(filter, expected):
+    dataframe = pd.DataFrame({"k": pd.Series(STRINGS, dtype="string[pyarrow]")})
+
+    assert build_filter_mask(dataframe, [filter]).tolist() == expected
+
+
+def test_every_operation_is_tested():
+    assert {filter.operation for _, filter, _ in CASES} == set(FILTER_OPERATIONS)
+
+
+def test_filters_are_combined():
+    dataframe = pd.DataFrame({"k": STRINGS, "n": NUMBER_STRINGS})
+
+    mask = build_filter_mask(
+        dataframe,
+        [
+            Filter(key="k", operation="starts_with", value="a"),
+            Filter(key="n", operation="greater_than", value=1),
+        ],
+    )
+
+    assert mask.tolist() == [F, F, F, F, T]
+
+
+def test_unknown_operation_raises():
+    dataframe = pd.DataFrame({"k": STRINGS})
+
+    with pytest.raises(ValueError):
+        build_filter_mask(dataframe, [Filter(key="k", operation="contains")])
@@ -0,0 +1,49 @@
+import geopandas as gpd
+import pandas as pd
+import pytest
+from shapely.geometry import Point
+
+from opendataproduct.transform.geodata_writer import join_template_features
+
+TEMPLATE = gpd.GeoDataFrame(
+    {"id": ["01", "02", "03"]},
+    geometry=[Point(0, 0), Point(1, 1), Point(2, 2)],
+    crs="EPSG:4326",
+)
+
+
+def test_rows_are_joined_to_template_features(capsys):
+    dataframe = pd.DataFrame({"id": ["01", "03"], "count": [1, 3]})
+
+    geodataframe = join_template_features(TEMPLATE, dataframe)
+
+    assert geodataframe["id"].tolist() == ["01", "02", "03"]
+    assert geodataframe["count"].tolist() == [1, pd.NA, 3]
+    assert capsys.readouterr().out == ""
+
+
+def test_no_matching_rows_raise():
+    # Numeric ids lose their leading zeros
+    dataframe = pd.DataFrame({"id": [1, 2, 3], "count": [1, 2, 3]})
+
+    with pytest.raises(ValueError):
+        join_template_features(TEMPLATE, dataframe)
+
+
+def test_few_matching_rows_print_warning(capsys):
+    dataframe = pd.DataFrame({"id": ["01", "1", "2", "3"], "count": [1, 1, 2, 3]})
+
+    geodataframe = join_template_features(TEMPLATE, dataframe)
+
+    assert geodataframe["count"].tolist() == [1, pd.NA, pd.NA]
+    assert "Only 1 of 4 rows" in capsys.readouterr().out
+
+
+def test_empty_dataframe_is_joined():
+    dataframe = pd.DataFrame({"id": pd.Series([], dtype=str)})
+
+    assert join_template_features(TEMPLATE, dataframe)["id"].tolist() == [
+        "01",
+        "02",
+        "03",
+    ]